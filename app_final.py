@@ -1,81 +1,288 @@
 import streamlit as st
-import random
+import functools
+import math
+import re
 import time
+import uuid
 from dotenv import load_dotenv
-from utils.groq_api import generate_questions
+from utils import game_engine as engine
+from utils import metrics
+from utils.game_stats import GameResult, GameStats
+from utils.groq_api import WOULD_YOU_RATHER_CATEGORY
+from utils.http_client import CircuitOpenError
+from utils.question_bank import QuestionBank
+from utils.question_cache import QuestionPool
+from utils.question_feed import PREFETCH_AHEAD, QUESTION_BATCH, PlayerQuestions, QuestionFeed
+from utils.question_store import get_store
+from utils.rooms import RoomRegistry
+from utils.scheduler import INTERACTIVE, PREFETCH
 
 load_dotenv()
 
 
 st.set_page_config(page_title="Money Mayhem - Fun Quiz Game", layout="wide")
 
+FEEDBACK_SECONDS = 4  # how long an answer's result is shown
+SKIP_FEEDBACK_SECONDS = 1
+
+def timed_fragment(name, run_every=None):
+    """
+    `st.fragment` that also times every run into app_fragment_seconds{fragment=name}
+
+    Widgets inside a fragment rerun only that function instead of the whole script.
+    """
+    def decorate(render):
+        @functools.wraps(render)
+        def timed(*args, **kwargs):
+            with metrics.span("app_fragment", fragment=name):
+                return render(*args, **kwargs)
+        return st.fragment(timed, run_every=run_every)
+    return decorate
+
+@st.cache_resource
+def start_metrics_export():
+    """Prometheus endpoint on METRICS_PORT, once per server process"""
+    return metrics.serve_from_env()
+
+@st.cache_resource
+def get_question_pool():
+    """One question pool per server process, shared by every session"""
+    return QuestionPool(bank=QuestionBank())
+
+@st.cache_resource
+def get_game_stats():
+    """Results store shared by every session; writes happen on its own thread"""
+    return GameStats()
+
+@st.cache_resource
+def get_rooms():
+    """Shared rooms of this server process"""
+    return RoomRegistry(get_question_pool())
+
+def current_room():
+    room_id = st.session_state.get('room_id')
+    return get_rooms().get(room_id) if room_id else None
+
 # Initialize game
-def init_game(category, question_type="financial"):
-    """Start new game"""
+def init_game(category, question_type="financial", room=None):
+    """Start new game, on the shared questions of `room` if given"""
     # Force clear all old game data to prevent repetition
-    keys_to_clear = ['questions', 'current_question_index', 'money', 'loan_taken', 
-                     'loan_amount', 'power_ups', 'next_question_multiplier']
-    for key in keys_to_clear:
+    for key in ['questions', 'game']:
         if key in st.session_state:
             del st.session_state[key]
     
     st.session_state.game_started = True
-    st.session_state.money = 100
-    st.session_state.current_question_index = 0
-    st.session_state.total_questions = 10
-    st.session_state.loan_taken = False
-    st.session_state.loan_amount = 0
-    st.session_state.game_over = False
-    st.session_state.questions_answered = 0
+    st.session_state.game = engine.GameState()
     st.session_state.category = category
     st.session_state.question_type = question_type
-    
-    # Power-ups
-    st.session_state.power_ups = {
-        "money_multiplier": 0,
-        "skip_question": 0,
-        "bankrupt_shield": 0,
-        "curse": 0
-    }
-    st.session_state.next_question_multiplier = 1.0
+    st.session_state.room_id = room.room_id if room else None
+    st.session_state.game_started_at = time.time()
+    # The name input is a landing page widget, whose state is dropped once the game screen shows
+    st.session_state.display_name = st.session_state.get('player_name', "").strip()
     
     st.session_state.show_feedback = False
-    st.session_state.feedback_message = ""
-    st.session_state.feedback_type = "info"
+    st.session_state.feedback_question = ""
+    st.session_state.feedback_messages = []
+    st.session_state.feedback_toasts = []
     st.session_state.feedback_time = 0
+    st.session_state.feedback_seconds = FEEDBACK_SECONDS
     
-    # Generate questions (more than 10 to handle curses)
+    # Questions are supplied on demand: a small first batch, then background
+    # top-ups as play nears the end of the supply or a curse extends the game
     try:
         with st.spinner(f"🤖 Generating {question_type} quiz questions..."):
-            questions = generate_questions(category, 20, question_type)  # this generate 20 for curse buffer
-            # Randomize options
-            for question in questions:
-                random.shuffle(question['options'])
+            if room:
+                # Everyone in the room reads the same feed, generated once
+                feed = room.questions
+            else:
+                pool = get_question_pool()
+                player_id = st.session_state.player_id
+                feed = QuestionFeed(
+                    fetch=lambda n, priority: pool.supply(category, n, question_type, player_id, priority),
+                    batch_size=QUESTION_BATCH,
+                    store=get_store(),
+                )
+            # The session keeps references to shared questions and its own option order, not copies
+            questions = PlayerQuestions(feed)
+            questions.ensure(QUESTION_BATCH, limit=st.session_state.game.total_questions, priority=INTERACTIVE)
+            # Play starts as soon as the first question is available
+            questions.wait_for(1, timeout=60)
+            if len(questions) == 0:
+                raise questions.error or ValueError("No questions generated")
             st.session_state.questions = questions
+    except CircuitOpenError as e:
+        st.error(f"Error: {e}")
+        st.info("Too many upstream failures, please try again in a moment")
+        st.session_state.game_started = False
     except Exception as e:
         st.error(f"Error: {e}")
         st.info("Check your GROQ_API_KEY in .env file")
         st.session_state.game_started = False
 
+def top_up_questions():
+    """Prefetch in the background once play gets close to the end of the supply"""
+    game = st.session_state.game
+    questions = st.session_state.questions
+    needed = game.current_question_index + 1 + PREFETCH_AHEAD
+    # A player already waiting on the spinner jumps the queue
+    priority = INTERACTIVE if game.current_question_index >= len(questions) else PREFETCH
+    questions.ensure(min(needed, game.total_questions), limit=game.total_questions, priority=priority)
+
+def start_feedback(question_text, messages, toasts, seconds=FEEDBACK_SECONDS):
+    """Enter the feedback phase; the result is rendered on the next run"""
+    st.session_state.show_feedback = True
+    st.session_state.feedback_question = question_text
+    st.session_state.feedback_messages = messages
+    st.session_state.feedback_toasts = toasts
+    st.session_state.feedback_time = time.time()
+    st.session_state.feedback_seconds = seconds
+
+def describe_answer(result):
+    """Turn an engine AnswerResult into feedback messages and toasts"""
+    messages = []
+    toasts = []
+    # Money change box with multiplier info
+    if result.actual > 0:
+        if result.total_multiplier != 1.0:
+            messages.append(("success", f"🎉 Congrats! You got {result.total_multiplier}x multiplier on this question! +${result.actual}"))
+        else:
+            messages.append(("success", f"✅ +${result.actual}"))
+    elif result.actual < 0:
+        if result.total_multiplier != 1.0:
+            messages.append(("error", f"⚠️ {result.total_multiplier}x multiplier applied! ${result.actual}"))
+        else:
+            messages.append(("error", f"❌ ${result.actual}"))
+    
+    if result.interest is not None:
+        messages.append(("warning", f"💳 Loan interest: +${result.interest}"))
+    
+    if result.boost:
+        messages.append(("success", "🎁 POWER-UP: Money Multiplier! Next question gets 2x money!"))
+        toasts.append(("💰 Money Boost Collected!", "🎉"))
+    if result.skip_token:
+        messages.append(("success", "🎁 POWER-UP: Got Skip token!"))
+        toasts.append(("⏭️ Skip Token Acquired!", "⭐"))
+    if result.shield_gained:
+        # Don't show success box immediately, only in sidebar
+        toasts.append(("🛡️ Rare Shield Acquired! Check sidebar!", "🔥"))
+    if result.curse_extra:
+        messages.append(("error", f"👿 CURSE: +{result.curse_extra} extra questions added!"))
+        toasts.append(("👿 Cursed!", "⚠️"))
+    
+    if result.shield_used:
+        messages.append(("success", "🛡️ SHIELD USED! Protected from negative money. Money set to $0"))
+        toasts.append(("🛡️ Shield activated! Net money set to $0", "🔥"))
+    if result.bankrupt:
+        messages.append(("error", "🚨 BANKRUPTCY!"))
+    return messages, toasts
+
+def end_feedback():
+    st.session_state.show_feedback = False
+    st.session_state.feedback_messages = []
+
+@timed_fragment("feedback_timer", run_every=1)
+def feedback_timer():
+    """Moves on once the feedback time is up; only this fragment reruns while waiting"""
+    remaining = st.session_state.feedback_seconds - (time.time() - st.session_state.feedback_time)
+    if remaining <= 0:
+        end_feedback()
+        st.rerun()
+    st.caption(f"⏳ Continuing in {math.ceil(remaining)}s...")
+
+def render_feedback():
+    """Show the result of the last answer without holding the script thread"""
+    st.markdown(f"### ❓ {st.session_state.feedback_question}")
+    for kind, message in st.session_state.feedback_messages:
+        getattr(st, kind)(message)
+    # Toasts only once, not on every timer tick
+    for message, icon in st.session_state.feedback_toasts:
+        st.toast(message, icon=icon)
+    st.session_state.feedback_toasts = []
+    
+    # Only the question panel changes, so only it reruns
+    st.button("➡️ Continue", type="primary", on_click=end_feedback)
+    feedback_timer()
+
+def record_outcome(game):
+    """Count and store a finished game once, by outcome, and look up its global ranks"""
+    outcome = "bankrupt" if game.game_over else "lost" if game.lost else "won"
+    question_type = st.session_state.question_type
+    category = st.session_state.category
+    stats = get_game_stats()
+    result = GameResult.from_game(game, st.session_state.player_id, question_type, category,
+                                  time.time() - st.session_state.get('game_started_at', time.time()),
+                                  st.session_state.get('display_name', ""))
+    # Ranks and the leaderboard are read before the (queued) write, so they count this game by hand
+    st.session_state.global_ranks = [("All " + question_type.replace("_", " ") + " games",
+                                      stats.rank(game.net, question_type))]
+    if question_type == "custom":
+        st.session_state.global_ranks.append((f"'{category}' games", stats.rank(game.net, question_type, category)))
+    st.session_state.leaderboard = stats.leaderboard(question_type, category if question_type == "custom" else None,
+                                                     including=result)
+    stats.record(result)
+    metrics.increment("games_finished_total", outcome=outcome, question_type=st.session_state.question_type)
+    metrics.observe("game_final_net", game.net, outcome=outcome)
+    metrics.observe("game_questions_answered", game.questions_answered)
+    metrics.event("game_finished", outcome=outcome, question_type=st.session_state.question_type,
+                  net=game.net, answered=game.questions_answered, total_questions=game.total_questions,
+                  loans=game.loans_taken, curses=game.curses)
+
+@timed_fragment("room_scoreboard", run_every=2)
+def room_scoreboard():
+    """Live scoreboard; only this fragment reruns to pick up other players' progress"""
+    room = current_room()
+    if room is None:
+        st.caption("This room has closed")
+        return
+    # Also picks up loan changes, which only rerun the status panel
+    room.report(st.session_state.player_id, st.session_state.game)
+    st.markdown(f"### 👥 Room {room.room_id}")
+    st.caption(f"Share the code to invite others · {len(room)} playing")
+    for rank, entry in enumerate(room.scoreboard(), 1):
+        if entry['lost']:
+            status = "💔"
+        elif entry['finished']:
+            status = "🏁"
+        else:
+            status = f"{entry['answered']}/{entry['total']}"
+        you = " (you)" if entry['player_id'] == st.session_state.player_id else ""
+        st.write(f"{rank}. {entry['name']}{you}: ${entry['net']} · {status}")
+
 def reset_to_landing():
     """Go back to landing page without resetting bankruptcy count"""
     bankruptcy = st.session_state.get('total_bankruptcies', 0)
+    player_id = st.session_state.get('player_id')
+    display_name = st.session_state.get('display_name', "")
     # Clear everything including questions to prevent repetition
     for key in list(st.session_state.keys()):
         del st.session_state[key]
     st.session_state.total_bankruptcies = bankruptcy
+    st.session_state.player_id = player_id
+    st.session_state.display_name = display_name
+    # Fills the name input back in on the landing page
+    st.session_state.player_name = display_name
     st.session_state.game_started = False
     st.session_state.bankruptcy_counted = False
 
-# Initialize total bankruptcies tracker
+# Player id keys the question pool so nobody is served the same question twice, and
+# the results store; it is kept in the URL so a reload or a bookmark keeps the same player
+if "player_id" not in st.session_state or st.session_state.player_id is None:
+    player_id = st.query_params.get("player", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", player_id):
+        player_id = uuid.uuid4().hex
+        st.query_params["player"] = player_id
+    st.session_state.player_id = player_id
+
+# Initialize total bankruptcies tracker from the stored results
 if "total_bankruptcies" not in st.session_state:
-    st.session_state.total_bankruptcies = 0
+    st.session_state.total_bankruptcies = get_game_stats().bankruptcies(st.session_state.player_id)
 
 if "game_started" not in st.session_state:
     st.session_state.game_started = False
 
 # LANDING PAGE
-if not st.session_state.game_started:
+def render_landing():
+    """Quiz type selection"""
     st.title("🎮 Money Mayhem - Fun Quiz Game")
     st.markdown("### Welcome! Test your decision-making skills in this fun quiz game!")
     st.write("Answer 10 questions, collect power-ups, and try to get the highest score!")
@@ -83,7 +290,36 @@ if not st.session_state.game_started:
     if st.session_state.total_bankruptcies > 0:
         st.info(f"📊 Total Bankruptcies: {st.session_state.total_bankruptcies}")
     
+    history = get_game_stats().history(st.session_state.player_id, limit=5)
+    if history:
+        with st.expander("📜 Your Recent Games"):
+            for result in history:
+                status = "💔" if result['lost'] else "🎉"
+                st.write(f"{status} ${result['net']} · {result['category']} · "
+                         f"{result['questions_answered']}/{result['total_questions']} answered")
+    
+    st.markdown("---")
+    quiz_picker()
+    st.markdown("---")
+    play_together()
+    
     st.markdown("---")
+    st.markdown("""
+    **🎮 How to Play:**
+    - Start with $100
+    - Answer 10 questions (4 options each)
+    - Best choices = more money 💰
+    - Poor choices = lose money ❌
+    - Collect power-ups: 💰 Boost, ⏭️ Skip, 🛡️ Shield
+    - Avoid 👿 Curses (add extra questions!)
+    - Take loans if needed (10% interest/question)
+    - Win by having money at the end!
+    """)
+
+# Typing into a text box reruns only the section it belongs to
+@timed_fragment("quiz_picker")
+def quiz_picker():
+    """Would You Rather and custom topic starts"""
     st.subheader("🎯 Choose Your Quiz Type")
     
     col1, col2 = st.columns(2)
@@ -95,7 +331,7 @@ if not st.session_state.game_started:
             
             if 'questions' in st.session_state:
                 del st.session_state['questions']
-            init_game("fun hypothetical scenarios and would you rather questions", "would_you_rather")
+            init_game(WOULD_YOU_RATHER_CATEGORY, "would_you_rather")
             st.rerun()
     
     with col2:
@@ -107,111 +343,60 @@ if not st.session_state.game_started:
                 del st.session_state['questions']
             init_game(custom_category, "custom")
             st.rerun()
+
+@timed_fragment("play_together")
+def play_together():
+    """Create or join a shared room"""
+    st.subheader("👥 Play Together")
+    st.write("Everyone in a room plays the same questions, with a live scoreboard.")
     
-    st.markdown("---")
-    st.markdown("""
-    **🎮 How to Play:**
-    - Start with $100
-    - Answer 10 questions (4 options each)
-    - Best choices = more money 💰
-    - Poor choices = lose money ❌
-    - Collect power-ups: 💰 Boost, ⏭️ Skip, 🛡️ Shield
-    - Avoid 👿 Curses (add extra questions!)
-    - Take loans if needed (10% interest/question)
-    - Win by having money at the end!
-    """)
+    name = st.text_input("Your name", key="player_name", max_chars=24)
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("### 🏠 Create a Room")
+        room_topic = st.text_input("Room topic (leave empty for Would You Rather)", key="room_topic")
+        if st.button("Create Room", use_container_width=True, key="create_room"):
+            question_type = "custom" if room_topic else "would_you_rather"
+            room = get_rooms().create(room_topic or WOULD_YOU_RATHER_CATEGORY, question_type, name)
+            room.join(st.session_state.player_id, name)
+            init_game(room.category, room.question_type, room)
+            st.rerun()
+    
+    with col2:
+        st.markdown("### 🚪 Join a Room")
+        room_code = st.text_input("Room code", key="room_code", max_chars=8)
+        if st.button("Join Room", use_container_width=True, key="join_room") and room_code:
+            room = get_rooms().get(room_code)
+            if room is None:
+                st.error("No room with that code")
+            else:
+                room.join(st.session_state.player_id, name)
+                init_game(room.category, room.question_type, room)
+                st.rerun()
 
 # MAIN GAME
-else:
+def render_game():
+    """Status sidebar plus the feedback, game over or active question view"""
+    game = st.session_state.game
     st.title("🎮 Money Mayhem Quiz")
     
     # Create layout: Left sidebar for power-ups, main area for game
     left_sidebar = st.sidebar
     
     with left_sidebar:
-        st.markdown("## 💰 Your Status")
-        
-        # Money display (large) - show both money and loan
-        net_money = st.session_state.money - st.session_state.loan_amount
-        
-        st.metric("💵 Current Money", f"${st.session_state.money}")
-        if st.session_state.loan_taken:
-            st.metric("💳 Loan Debt", f"-${st.session_state.loan_amount}", delta="Debt")
-            if net_money >= 0:
-                st.metric("📊 Net Total", f"${net_money}", delta="Positive")
-            else:
-                st.metric("📊 Net Total", f"${net_money}", delta="Negative", delta_color="inverse")
-        else:
-            st.metric("📊 Net Total", f"${net_money}")
-        
-        st.markdown("---")
-        
-        # Power-ups
-        st.markdown("### 🎁 Power-Ups")
-        
-        # Money Multiplier (show if next question will have boost)
-        if st.session_state.next_question_multiplier > 1.0:
-            st.success(f"💰 Money Boost: Active")
-            st.caption("Next question gets 2x money!")
-        else:
-            st.info("💰 Money Boost: 0")
-        
-        # Skip
-        if st.session_state.power_ups["skip_question"] > 0:
-            st.success(f"⏭️ Skip: {st.session_state.power_ups['skip_question']}")
-        else:
-            st.info("⏭️ Skip: 0")
-        
-        # Shield
-        if st.session_state.power_ups["bankrupt_shield"] > 0:
-            st.success(f"🛡️ Shield: {st.session_state.power_ups['bankrupt_shield']}")
-            st.caption("Sets negative money to $0")
+        # The final summary shows money and debt too, so after the last
+        # question the status reruns with the page instead of on its own
+        if game.finished:
+            render_status()
         else:
-            st.info("🛡️ Shield: 0")
-        
-        # Curse
-        if st.session_state.power_ups["curse"] > 0:
-            st.warning(f"👿 Curse: {st.session_state.power_ups['curse']}")
-            st.caption(f"+{st.session_state.power_ups['curse']} extra questions")
+            status_panel()
         
         st.markdown("---")
         
-        # Loan info
-        if st.session_state.loan_taken:
-            st.error(f"💳 Loan: ${st.session_state.loan_amount}")
-            st.caption("10% interest per question")
-            
-            # Repayment
-            if st.session_state.money > 0:
-                repay = st.number_input("Repay amount", 0, min(st.session_state.money, st.session_state.loan_amount), 0, 10)
-                if st.button("💵 Repay Loan") and repay > 0:
-                    st.session_state.money -= repay
-                    st.session_state.loan_amount -= repay
-                    if st.session_state.loan_amount <= 0:
-                        st.session_state.loan_taken = False
-                        st.session_state.loan_amount = 0
-                        st.toast("🎉 Loan fully repaid!", icon="✅")
-                    else:
-                        st.toast(f"Repaid ${repay}", icon="💵")
-                    st.rerun()
-        else:
-            questions_left = st.session_state.total_questions - st.session_state.current_question_index
-            if net_money < 0 and questions_left >= 2:
-                st.warning("💸 Need money?")
-                st.toast("⚠️ You're running out of money! Consider taking a loan.", icon="💳")
-                st.toast("⚠️ FOR TAKING THE LOAN SCROLL LEFT \"YOUR STATUS\" OPTION TO DOWN ⚠️")
-                loan_amt = st.number_input("Loan amount", 10, 500, 100, 10)
-                if st.button("💳 Take Loan"):
-                    st.session_state.money += loan_amt
-                    st.session_state.loan_amount = loan_amt
-                    st.session_state.loan_taken = True
-                    st.toast(f"Loan approved: ${loan_amt}", icon="✅")
-                    st.rerun()
-            elif net_money < 0 and questions_left < 2:
-                st.error("⚠️ Cannot take loan!")
-                st.caption("Need at least 2 questions remaining")
-        
-        st.markdown("---")
+        if st.session_state.room_id:
+            room_scoreboard()
+            st.markdown("---")
         
         # Back button
         if st.button("⬅️ Back to Menu", use_container_width=True):
@@ -222,27 +407,134 @@ else:
     st.markdown("---")
     
     # Progress
-    progress = min(st.session_state.current_question_index, st.session_state.total_questions) / st.session_state.total_questions
-    st.progress(progress, text=f"Progress: {st.session_state.current_question_index}/{st.session_state.total_questions}")
+    progress = min(game.current_question_index, game.total_questions) / game.total_questions
+    st.progress(progress, text=f"Progress: {game.current_question_index}/{game.total_questions}")
+    
+    st.markdown("---")
+    
+    question_panel()
+
+# Loan button callbacks; they run before the status panel renders, so it shows the result.
+# The amount inputs may already be gone (e.g. the panel changed since), which counts as 0
+def repay_loan():
+    game = st.session_state.game
+    repay = st.session_state.get('repay_input', 0)
+    if repay > 0:
+        engine.repay(game, repay)
+        if not game.loan_taken:
+            st.toast("🎉 Loan fully repaid!", icon="✅")
+        else:
+            st.toast(f"Repaid ${repay}", icon="💵")
+
+def take_loan():
+    loan_amt = st.session_state.get('loan_input', 0)
+    if engine.take_loan(st.session_state.game, loan_amt):
+        st.toast(f"Loan approved: ${loan_amt}", icon="✅")
+
+def render_status():
+    """Money, power-ups and loan controls"""
+    st.markdown("## 💰 Your Status")
+    
+    # Money display (large) - show both money and loan
+    game = st.session_state.game
+    net_money = game.net
+    
+    st.metric("💵 Current Money", f"${game.money}")
+    if game.loan_taken:
+        st.metric("💳 Loan Debt", f"-${game.loan_amount}", delta="Debt")
+        if net_money >= 0:
+            st.metric("📊 Net Total", f"${net_money}", delta="Positive")
+        else:
+            st.metric("📊 Net Total", f"${net_money}", delta="Negative", delta_color="inverse")
+    else:
+        st.metric("📊 Net Total", f"${net_money}")
+    
+    st.markdown("---")
+    
+    # Power-ups
+    st.markdown("### 🎁 Power-Ups")
+    
+    # Money Multiplier (show if next question will have boost)
+    if game.next_question_multiplier > 1.0:
+        st.success(f"💰 Money Boost: Active")
+        st.caption("Next question gets 2x money!")
+    else:
+        st.info("💰 Money Boost: 0")
+    
+    # Skip
+    if game.skips > 0:
+        st.success(f"⏭️ Skip: {game.skips}")
+    else:
+        st.info("⏭️ Skip: 0")
+    
+    # Shield
+    if game.shields > 0:
+        st.success(f"🛡️ Shield: {game.shields}")
+        st.caption("Sets negative money to $0")
+    else:
+        st.info("🛡️ Shield: 0")
+    
+    # Curse
+    if game.curses > 0:
+        st.warning(f"👿 Curse: {game.curses}")
+        st.caption(f"+{game.curses} extra questions")
     
     st.markdown("---")
     
+    # Loan info
+    if game.loan_taken:
+        st.error(f"💳 Loan: ${game.loan_amount}")
+        st.caption("10% interest per question")
+        
+        # Repayment
+        if game.money > 0:
+            st.number_input("Repay amount", 0, min(game.money, game.loan_amount), 0, 10, key="repay_input")
+            st.button("💵 Repay Loan", on_click=repay_loan)
+    else:
+        if engine.can_take_loan(game):
+            st.warning("💸 Need money?")
+            st.toast("⚠️ You're running out of money! Consider taking a loan.", icon="💳")
+            st.toast("⚠️ FOR TAKING THE LOAN SCROLL LEFT \"YOUR STATUS\" OPTION TO DOWN ⚠️")
+            st.number_input("Loan amount", 10, 500, 100, 10, key="loan_input")
+            st.button("💳 Take Loan", on_click=take_loan)
+        elif net_money < 0:
+            st.error("⚠️ Cannot take loan!")
+            st.caption(f"Need at least {engine.MIN_QUESTIONS_FOR_LOAN} questions remaining")
+
+# Loan inputs and buttons rerun only the status panel
+status_panel = timed_fragment("status_panel")(render_status)
+
+# Answers change the status and progress too, so they still rerun the page;
+# Continue and the feedback timer only change this panel
+@timed_fragment("question_panel")
+def question_panel():
+    """Feedback, game over or the active question"""
+    game = st.session_state.game
+    
+    # FEEDBACK for the last answer
+    if st.session_state.show_feedback:
+        render_feedback()
+    
     # GAME OVER
-    if st.session_state.game_over or st.session_state.current_question_index >= st.session_state.total_questions:
-        final_net = st.session_state.money - st.session_state.loan_amount
+    elif game.finished:
+        final_net = game.net
         
         # Check if already counted bankruptcy
         if not st.session_state.get('bankruptcy_counted', False):
-            if st.session_state.game_over or final_net < 0:
+            if game.lost:
                 st.session_state.total_bankruptcies += 1
                 st.session_state.bankruptcy_counted = True
         
+        if not st.session_state.get('outcome_recorded', False):
+            record_outcome(game)
+            st.session_state.outcome_recorded = True
+        
         # Loan warning if unpaid
-        if st.session_state.loan_taken and st.session_state.loan_amount > 0:
-            st.warning(f"⚠️ Unpaid Loan: ${st.session_state.loan_amount}")
+        if game.loan_taken and game.loan_amount > 0:
+            st.warning(f"⚠️ Unpaid Loan: ${game.loan_amount}")
         
         # Win/Loss determination
-        if st.session_state.game_over or final_net < 0:
+        if game.lost:
             st.error("💔 Game Over - You Lost!")
             st.snow()
         else:
@@ -252,40 +544,53 @@ else:
         st.markdown("### 📊 Final Summary")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Money Earned", f"${st.session_state.money}")
-            if st.session_state.loan_taken:
-                st.metric("Loan Debt", f"-${st.session_state.loan_amount}")
+            st.metric("Money Earned", f"${game.money}")
+            if game.loan_taken:
+                st.metric("Loan Debt", f"-${game.loan_amount}")
             st.metric("Net Total", f"${final_net}", delta="Win" if final_net >= 0 else "Loss")
         with col2:
-            st.metric("Questions Answered", st.session_state.questions_answered)
+            st.metric("Questions Answered", game.questions_answered)
         with col3:
             st.metric("Total Bankruptcies", st.session_state.total_bankruptcies)
         
+        st.markdown("### 🏆 Global Ranking")
+        for label, (rank, total) in st.session_state.get('global_ranks', []):
+            st.write(f"**#{rank}** of {total} · {label}")
+        leaderboard = st.session_state.get('leaderboard', [])
+        if leaderboard:
+            with st.expander("Top Scores"):
+                for position, result in enumerate(leaderboard, 1):
+                    you = " (you)" if result['player_id'] == st.session_state.player_id else ""
+                    st.write(f"{position}. {result['player_name'] or 'Anonymous'}{you}: ${result['net']}")
+        
         if st.button("🔄 Play Again", use_container_width=True):
             reset_to_landing()
             st.rerun()
     
     # ACTIVE QUESTION
     else:
-        if st.session_state.current_question_index < len(st.session_state.questions):
-            current_q = st.session_state.questions[st.session_state.current_question_index]
+        # Remaining questions are fetched in the background as play advances
+        top_up_questions()
+        if game.current_question_index >= len(st.session_state.questions) and not st.session_state.questions.done:
+            with st.spinner("🤖 Generating more questions..."):
+                st.session_state.questions.wait_for(game.current_question_index + 1, timeout=60)
+        
+        if game.current_question_index < len(st.session_state.questions):
+            current_q = st.session_state.questions[game.current_question_index]
             
             st.markdown(f"### ❓ {current_q['question']}")
             
             # Active multiplier warning
-            if st.session_state.next_question_multiplier > 1.0:
-                st.warning(f"🔥 MONEY BOOST ACTIVE: This question gets {st.session_state.next_question_multiplier}x money!")
+            if game.next_question_multiplier > 1.0:
+                st.warning(f"🔥 MONEY BOOST ACTIVE: This question gets {game.next_question_multiplier}x money!")
             
             st.write("")
             
             # Skip button
-            if st.session_state.power_ups["skip_question"] > 0:
-                if st.button("⏭️ Use Skip (Skip this question)", type="secondary"):
-                    st.session_state.power_ups["skip_question"] -= 1
-                    st.session_state.current_question_index += 1
-                    st.info("⏭️ Question skipped!")
-                    st.toast("Question skipped!", icon="⏭️")
-                    time.sleep(1)
+            if game.skips > 0:
+                if st.button("⏭️ Use Skip (Skip this question)", type="secondary") and engine.skip(game):
+                    start_feedback(current_q['question'], [("info", "⏭️ Question skipped!")],
+                                   [("Question skipped!", "⏭️")], seconds=SKIP_FEEDBACK_SECONDS)
                     st.rerun()
             
             st.markdown("---")
@@ -295,85 +600,28 @@ else:
             for idx, option in enumerate(current_q['options']):
                 with col1 if idx % 2 == 0 else col2:
                     if st.button(option['text'], key=f"opt_{idx}", use_container_width=True):
-                        # Calculate money
-                        base = option.get('money_change', 0)
-                        mult = option.get('multiplier', 1.0)
-                        active_mult = st.session_state.next_question_multiplier
-                        total_mult = mult * active_mult
-                        actual = int(base * total_mult)
-                        
-                        st.session_state.money += actual
-                        st.session_state.questions_answered += 1
-                        
-                        # Show feedback
-                        # Money change box with multiplier info
-                        if actual > 0:
-                            if total_mult != 1.0:
-                                st.success(f"🎉 Congrats! You got {total_mult}x multiplier on this question! +${actual}")
-                            else:
-                                st.success(f"✅ +${actual}")
-                        elif actual < 0:
-                            if total_mult != 1.0:
-                                st.error(f"⚠️ {total_mult}x multiplier applied! ${actual}")
-                            else:
-                                st.error(f"❌ ${actual}")
-                        
-                        # Loan interest
-                        if st.session_state.loan_taken:
-                            interest = int(st.session_state.loan_amount * 0.10)
-                            st.session_state.loan_amount += interest
-                            st.warning(f"💳 Loan interest: +${interest}")
-                        
-                        # Reset multiplier
-                        st.session_state.next_question_multiplier = 1.0
-                        
-                        # Probability-based power-ups (independent of API)
-                        # Only give money boost if not already active
-                        if random.random() < 0.09 and st.session_state.next_question_multiplier == 1.0:
-                            st.session_state.next_question_multiplier = 2.0
-                            st.success("🎁 POWER-UP: Money Multiplier! Next question gets 2x money!")
-                            st.toast("💰 Money Boost Collected!", icon="🎉")
-                        
-                        
-                        if random.random() < 0.08:
-                            st.session_state.power_ups["skip_question"] += 1
-                            st.success("🎁 POWER-UP: Got Skip token!")
-                            st.toast("⏭️ Skip Token Acquired!", icon="⭐")
-                        
-                        # Shield: ~5% chance (max 1 per game) - Very rare!
-                        if random.random() < 0.05 and st.session_state.power_ups["bankrupt_shield"] == 0:
-                            st.session_state.power_ups["bankrupt_shield"] = 1
-                            # Don't show success box immediately, only in sidebar
-                            st.toast("🛡️ Rare Shield Acquired! Check sidebar!", icon="🔥")
-                        
-                       
-                        if random.random() < 0.02:
-                            curse_amt = random.choice([2, 3])
-                            st.session_state.power_ups["curse"] += 1
-                            st.session_state.total_questions += curse_amt
-                            st.error(f"👿 CURSE: +{curse_amt} extra questions added!")
-                            st.toast("👿 Cursed!", icon="⚠️")
-                        
-                        # Check bankruptcy
-                        net = st.session_state.money - st.session_state.loan_amount
-                        left = st.session_state.total_questions - (st.session_state.current_question_index + 1)
-                        
-                        if net < 0 and st.session_state.power_ups["bankrupt_shield"] > 0:
-                            st.session_state.power_ups["bankrupt_shield"] -= 1
-                            
-                            amount_needed = abs(net)
-                            st.session_state.money += amount_needed
-                            st.success(f"🛡️ SHIELD USED! Protected from negative money. Money set to $0")
-                            st.toast("🛡️ Shield activated! Net money set to $0", icon="🔥")
-                            net = st.session_state.money - st.session_state.loan_amount
-                        
-                        if net < 0 and left == 0:
-                            st.session_state.game_over = True
-                            st.error("🚨 BANKRUPTCY!")
-                        
-                        st.session_state.current_question_index += 1
-                        
-                        time.sleep(4) 
+                        result = engine.apply_answer(game, option)
+                        messages, toasts = describe_answer(result)
+                        start_feedback(current_q['question'], messages, toasts)
                         st.rerun()
         else:
             st.error("No more questions available")
+
+def current_view():
+    if not st.session_state.game_started:
+        return "landing"
+    if st.session_state.show_feedback:
+        return "feedback"
+    return "game_over" if st.session_state.game.finished else "question"
+
+start_metrics_export()
+rerun_started = time.perf_counter()
+view = current_view()
+try:
+    if st.session_state.game_started:
+        render_game()
+    else:
+        render_landing()
+finally:
+    # Also runs when st.rerun() cuts the script short
+    metrics.observe("app_rerun_seconds", time.perf_counter() - rerun_started, view=view)
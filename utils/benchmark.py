@@ -0,0 +1,236 @@
+"""
+Micro-benchmarks for per-session costs of the app
+
+    python -m utils.benchmark sessions --sessions 2000
+    python -m utils.benchmark reruns --runs 50
+
+`sessions` measures the memory one game session keeps for its questions and
+game state, comparing private question copies (how sessions used to hold
+them) with references into the shared QuestionStore.
+
+`reruns` renders app_final.py headlessly and compares, per kind of click,
+the full script run every click used to cost with the fragment that click
+reruns now.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from utils import game_engine as engine
+from utils import metrics
+from utils.question_feed import PlayerQuestions, QuestionFeed
+from utils.question_store import QuestionStore
+
+WORDS = ("money", "choice", "friend", "future", "secret", "travel", "island", "dragon", "robot",
+         "castle", "ocean", "forest", "winter", "summer", "lottery", "career", "family", "rocket")
+
+
+def make_corpus(count, rng):
+    """Question dictionaries with roughly the text lengths the model produces"""
+    def sentence(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    return [
+        {"question": f"Would you rather {sentence(14).lower()} or {sentence(4).lower()}?",
+         "options": [{"text": sentence(7), "money_change": rng.randint(-90, 30),
+                      **({"multiplier": 2.0} if rng.random() < 0.2 else {})} for _ in range(4)]}
+        for _ in range(count)
+    ]
+
+
+def _legacy_session(corpus, picks, rng):
+    """Private decoded copies with options shuffled in place, as sessions used to hold them"""
+    def shuffle_options(question):
+        rng.shuffle(question["options"])
+        return question
+
+    feed = QuestionFeed([json.loads(json.dumps(corpus[i])) for i in picks], prepare=shuffle_options)
+    return engine.GameState(), feed
+
+
+def _compact_session(store, corpus, picks, rng):
+    """References into the shared store plus one option-order byte per question"""
+    feed = QuestionFeed([json.loads(json.dumps(corpus[i])) for i in picks], store=store)
+    questions = PlayerQuestions(feed, rng)
+    for index in range(len(questions)):
+        questions[index]  # draw every option order, as a finished game would have
+    return engine.GameState(), questions
+
+
+def _measure(build, sessions):
+    """Bytes still allocated per session after building `sessions` of them"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build() for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / sessions
+
+
+def bench_sessions(sessions=2000, questions=20, corpus_size=2000, seed=0):
+    """
+    Compare bytes per session before and after interning questions
+
+    Each session plays `questions` questions drawn from a shared corpus of
+    `corpus_size`, as players drawing from the same question pool do.
+
+    Returns:
+        Dictionary with legacy and compact bytes per session, the store's size and the ratio
+    """
+    rng = random.Random(seed)
+    corpus = make_corpus(corpus_size, rng)
+    draws = [rng.sample(range(corpus_size), questions) for _ in range(sessions)]
+
+    picks = iter(draws)
+    legacy = _measure(lambda: _legacy_session(corpus, next(picks), rng), sessions)
+
+    store = QuestionStore(max_questions=corpus_size)
+    tracemalloc.start()
+    for question in corpus:
+        store.add(json.loads(json.dumps(question)))
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    picks = iter(draws)
+    compact = _measure(lambda: _compact_session(store, corpus, next(picks), rng), sessions)
+
+    return {
+        "sessions": sessions,
+        "questions_per_session": questions,
+        "legacy_bytes_per_session": legacy,
+        "compact_bytes_per_session": compact,
+        "shared_store_bytes": store_bytes,
+        "ratio": legacy / compact,
+    }
+
+
+def _print_sessions(report):
+    gib = 1024 ** 3
+    print(f"== {report['sessions']} sessions x {report['questions_per_session']} questions")
+    print(f"  private copies   {report['legacy_bytes_per_session']:>10,.0f} bytes/session"
+          f"  ({gib / report['legacy_bytes_per_session']:,.0f} sessions/GiB)")
+    print(f"  shared store     {report['compact_bytes_per_session']:>10,.0f} bytes/session"
+          f"  ({gib / report['compact_bytes_per_session']:,.0f} sessions/GiB)")
+    print(f"  store itself     {report['shared_store_bytes']:>10,.0f} bytes, paid once per process")
+    print(f"  {report['ratio']:.1f}x less memory per session")
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_final.py")
+
+# Click, the scenario it happens in, and the fragment it reruns (None: the whole script)
+CLICKS = (
+    ("type a custom topic", "landing", "quiz_picker"),
+    ("type a name or room code", "landing", "play_together"),
+    ("edit loan amount / Take Loan", "in_debt", "status_panel"),
+    ("edit repay amount / Repay Loan", "with_loan", "status_panel"),
+    ("Continue after an answer", "feedback", "question_panel"),
+    ("answer a question", "question", None),
+)
+
+
+def _game_session(at, rng, game, feedback=False):
+    """Put an AppTest session in the middle of a game, as init_game would"""
+    at.session_state.player_id = "0" * 32
+    at.session_state.total_bankruptcies = 0
+    at.session_state.game_started = True
+    at.session_state.game = game
+    at.session_state.category = "benchmark"
+    at.session_state.question_type = "custom"
+    at.session_state.room_id = None
+    at.session_state.game_started_at = time.time()
+    at.session_state.questions = PlayerQuestions(QuestionFeed(make_corpus(game.total_questions, rng),
+                                                              store=QuestionStore()), rng)
+    at.session_state.show_feedback = feedback
+    at.session_state.feedback_question = "Would you rather benchmark or guess?"
+    at.session_state.feedback_messages = [("success", "✅ +$20")]
+    at.session_state.feedback_toasts = []
+    at.session_state.feedback_time = time.time()
+    at.session_state.feedback_seconds = 3600  # keep the countdown from ending the phase
+
+
+def bench_reruns(runs=50, seed=0):
+    """
+    Time full script runs and fragment runs of app_final.py per kind of click
+
+    Each scenario renders the app `runs` times with AppTest. Every fragment
+    runs inside a full run too, so one pass yields both costs.
+
+    Returns:
+        List of (click, full-run seconds, rerun seconds now) using medians
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    directory = tempfile.mkdtemp(prefix="money-mayhem-bench-")
+    os.environ.update(GAME_STATS_PATH=os.path.join(directory, "stats.sqlite3"),
+                      QUESTION_CACHE_PATH=os.path.join(directory, "pool.sqlite3"))
+    os.environ.pop("METRICS_PORT", None)
+
+    in_debt = engine.GameState()
+    in_debt.money = -40
+    with_loan = engine.GameState()
+    with_loan.loan_taken, with_loan.loan_amount, with_loan.money = True, 100, 150
+    # Scenario: (view, game state or None for the landing page)
+    scenarios = {
+        "landing": ("landing", None),
+        "question": ("question", engine.GameState()),
+        "in_debt": ("question", in_debt),
+        "with_loan": ("question", with_loan),
+        "feedback": ("feedback", engine.GameState()),
+    }
+
+    timings = {}
+    for scenario, (view, game) in scenarios.items():
+        metrics.reset()
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        if game is not None:
+            _game_session(at, rng, game, feedback=view == "feedback")
+        for _ in range(runs):
+            at.run()
+        if at.exception:
+            raise RuntimeError(f"{scenario} scenario failed: {at.exception[0].message}")
+        summaries = metrics.snapshot()["summaries"]
+        timings[scenario] = {name: summary["p50"] for name, summary in summaries.items()}
+        timings[scenario]["full"] = summaries[f"app_rerun_seconds{{view={view}}}"]["p50"]
+
+    results = []
+    for click, scenario, fragment in CLICKS:
+        full = timings[scenario]["full"]
+        now = full if fragment is None else timings[scenario][f"app_fragment_seconds{{fragment={fragment}}}"]
+        results.append((click, full, now))
+    return results
+
+
+def _print_reruns(results, runs):
+    print(f"== script time per click, median of {runs} runs")
+    print(f"  {'click':<34}{'whole script':>14}{'now':>10}{'saved':>8}")
+    for click, full, now in results:
+        print(f"  {click:<34}{full * 1000:>11.2f} ms{now * 1000:>7.2f} ms{1 - now / full:>8.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-session cost benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sessions_parser = commands.add_parser("sessions", help="memory held per game session")
+    sessions_parser.add_argument("--sessions", type=int, default=2000)
+    sessions_parser.add_argument("--questions", type=int, default=20,
+                                 help="questions each session has played")
+    sessions_parser.add_argument("--corpus", type=int, default=2000, help="distinct questions in the pool")
+    sessions_parser.add_argument("--seed", type=int, default=0)
+    reruns_parser = commands.add_parser("reruns", help="script time per click, whole page vs fragment")
+    reruns_parser.add_argument("--runs", type=int, default=50)
+    reruns_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "sessions":
+        _print_sessions(bench_sessions(args.sessions, args.questions, args.corpus, args.seed))
+    elif args.command == "reruns":
+        _print_reruns(bench_reruns(args.runs, args.seed), args.runs)
+
+
+if __name__ == "__main__":
+    main()
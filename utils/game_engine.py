@@ -0,0 +1,194 @@
+"""
+Headless game rules for Money Mayhem
+
+Everything here is plain Python with no Streamlit dependency, so the rules can
+be run, profiled and simulated outside a browser session. The UI keeps one
+GameState per session and turns the results into messages.
+"""
+import random
+
+START_MONEY = 100
+QUESTIONS_PER_GAME = 10
+LOAN_INTEREST = 0.10  # per answered question
+MIN_QUESTIONS_FOR_LOAN = 2
+
+# Power-up rolls after every answer
+BOOST_CHANCE = 0.09
+BOOST_MULTIPLIER = 2.0
+SKIP_CHANCE = 0.08
+SHIELD_CHANCE = 0.05  # max one shield held at a time
+CURSE_CHANCE = 0.02
+CURSE_EXTRA_QUESTIONS = (2, 3)
+
+
+class GameState:
+    """All per-game state in one compact object"""
+
+    __slots__ = (
+        "money", "loan_amount", "loan_taken", "loans_taken",
+        "current_question_index", "total_questions", "questions_answered",
+        "next_question_multiplier", "skips", "shields", "curses", "game_over",
+    )
+
+    def __init__(self, total_questions=QUESTIONS_PER_GAME, money=START_MONEY):
+        self.money = money
+        self.loan_amount = 0
+        self.loan_taken = False
+        self.loans_taken = 0
+        self.current_question_index = 0
+        self.total_questions = total_questions
+        self.questions_answered = 0
+        self.next_question_multiplier = 1.0
+        self.skips = 0
+        self.shields = 0
+        self.curses = 0
+        self.game_over = False
+
+    @property
+    def net(self):
+        return self.money - self.loan_amount
+
+    @property
+    def questions_left(self):
+        return self.total_questions - self.current_question_index
+
+    @property
+    def finished(self):
+        return self.game_over or self.current_question_index >= self.total_questions
+
+    @property
+    def lost(self):
+        return self.game_over or self.net < 0
+
+
+class AnswerResult:
+    """What happened when an option was picked, for the UI to report"""
+
+    __slots__ = (
+        "actual", "total_multiplier", "interest", "boost", "skip_token",
+        "shield_gained", "curse_extra", "shield_used", "bankrupt",
+    )
+
+    def __init__(self):
+        self.actual = 0
+        self.total_multiplier = 1.0
+        self.interest = None
+        self.boost = False
+        self.skip_token = False
+        self.shield_gained = False
+        self.curse_extra = 0
+        self.shield_used = False
+        self.bankrupt = False
+
+
+def apply_answer(state, option, rng=random):
+    """
+    Apply the player's chosen option and advance to the next question
+
+    Args:
+        state: GameState to update in place
+        option: Option dictionary with money_change and optional multiplier
+        rng: Source of randomness for power-up rolls (anything with random() and choice())
+
+    Returns:
+        AnswerResult describing the payout and any power-ups, curses or shield use
+    """
+    result = AnswerResult()
+
+    # Money
+    base = option.get('money_change', 0)
+    mult = option.get('multiplier', 1.0)
+    result.total_multiplier = mult * state.next_question_multiplier
+    result.actual = int(base * result.total_multiplier)
+    state.money += result.actual
+    state.questions_answered += 1
+
+    # Loan interest
+    if state.loan_taken:
+        result.interest = int(state.loan_amount * LOAN_INTEREST)
+        state.loan_amount += result.interest
+
+    # Boost only lasts one question
+    state.next_question_multiplier = 1.0
+
+    # Probability-based power-ups (independent of API)
+    if rng.random() < BOOST_CHANCE and state.next_question_multiplier == 1.0:
+        state.next_question_multiplier = BOOST_MULTIPLIER
+        result.boost = True
+
+    if rng.random() < SKIP_CHANCE:
+        state.skips += 1
+        result.skip_token = True
+
+    if rng.random() < SHIELD_CHANCE and state.shields == 0:
+        state.shields = 1
+        result.shield_gained = True
+
+    if rng.random() < CURSE_CHANCE:
+        result.curse_extra = rng.choice(CURSE_EXTRA_QUESTIONS)
+        state.curses += 1
+        state.total_questions += result.curse_extra
+
+    # Bankruptcy check; a shield lifts net money back to $0
+    left = state.total_questions - (state.current_question_index + 1)
+    if state.net < 0 and state.shields > 0:
+        state.shields -= 1
+        state.money += -state.net
+        result.shield_used = True
+
+    if state.net < 0 and left == 0:
+        state.game_over = True
+        result.bankrupt = True
+
+    state.current_question_index += 1
+    return result
+
+
+def skip(state):
+    """
+    Use a skip token on the current question
+
+    Returns:
+        True if a token was available and used
+    """
+    if state.skips <= 0:
+        return False
+    state.skips -= 1
+    state.current_question_index += 1
+    return True
+
+
+def can_take_loan(state):
+    return not state.loan_taken and state.net < 0 and state.questions_left >= MIN_QUESTIONS_FOR_LOAN
+
+
+def take_loan(state, amount):
+    """
+    Borrow `amount`; interest is charged on every answered question
+
+    Returns:
+        True if the loan was granted
+    """
+    if not can_take_loan(state) or amount <= 0:
+        return False
+    state.money += amount
+    state.loan_amount = amount
+    state.loan_taken = True
+    state.loans_taken += 1
+    return True
+
+
+def repay(state, amount):
+    """
+    Pay back part or all of the loan, limited by cash and debt
+
+    Returns:
+        Amount actually repaid
+    """
+    amount = max(0, min(amount, state.money, state.loan_amount))
+    state.money -= amount
+    state.loan_amount -= amount
+    if state.loan_amount <= 0:
+        state.loan_taken = False
+        state.loan_amount = 0
+    return amount
@@ -0,0 +1,241 @@
+"""
+Durable game results, player history and leaderboards
+
+Finished games are queued in memory and written by one background thread in
+batched transactions, so recording a result never waits on the disk. Reads
+(history, leaderboards, ranks) use their own connection and, with SQLite in
+WAL mode, never block on the writer.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+from utils.question_cache import normalize_category
+
+DEFAULT_PATH = os.getenv("GAME_STATS_PATH", os.path.join(".cache", "game_stats.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id TEXT NOT NULL,
+    player_name TEXT NOT NULL DEFAULT '',
+    question_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    net INTEGER NOT NULL,
+    questions_answered INTEGER NOT NULL,
+    total_questions INTEGER NOT NULL,
+    loans INTEGER NOT NULL,
+    curses INTEGER NOT NULL,
+    lost INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_player ON results (player_id, finished_at);
+CREATE INDEX IF NOT EXISTS idx_results_mode ON results (question_type, net);
+CREATE INDEX IF NOT EXISTS idx_results_category ON results (question_type, category, net);
+CREATE TABLE IF NOT EXISTS score_counts (
+    question_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    net INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (question_type, category, net)
+) WITHOUT ROWID;
+"""
+
+ALL_CATEGORIES = ""  # score_counts category of the mode-wide tally
+
+_COLUMNS = ("player_id", "player_name", "question_type", "category", "net", "questions_answered",
+            "total_questions", "loans", "curses", "lost", "duration", "finished_at")
+
+
+class GameResult:
+    """One finished game as stored in the results table"""
+
+    __slots__ = _COLUMNS
+
+    def __init__(self, player_id, question_type, category, net, questions_answered, total_questions,
+                 loans=0, curses=0, lost=False, duration=0.0, player_name="", finished_at=None):
+        self.player_id = player_id
+        self.player_name = player_name or ""
+        self.question_type = question_type
+        self.category = normalize_category(category)
+        self.net = int(net)
+        self.questions_answered = questions_answered
+        self.total_questions = total_questions
+        self.loans = loans
+        self.curses = curses
+        self.lost = bool(lost)
+        self.duration = round(duration, 3)
+        self.finished_at = finished_at if finished_at is not None else time.time()
+
+    @classmethod
+    def from_game(cls, game, player_id, question_type, category, duration, player_name=""):
+        """Build a result from a finished engine GameState"""
+        return cls(player_id, question_type, category, game.net, game.questions_answered,
+                   game.total_questions, game.loans_taken, game.curses, game.lost, duration, player_name)
+
+    def row(self):
+        return tuple(getattr(self, column) for column in _COLUMNS)
+
+
+class GameStats:
+    """
+    SQLite store of finished games with batched, asynchronous writes
+
+    `record` only appends to a queue. The writer thread commits whatever has
+    queued up, at most `batch_size` rows per transaction, waiting up to
+    `flush_interval` seconds for a batch to fill. Call `flush` to wait for
+    everything queued so far to be on disk.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, batch_size=200, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._writer = threading.Thread(target=self._write_loop, name="game-stats-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, result):
+        """Queue a GameResult for writing; returns immediately"""
+        with self._pending_cond:
+            self._pending += 1
+        self._queue.put(result)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every result queued so far has been written
+
+        Returns:
+            True if the queue drained within `timeout`
+        """
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def history(self, player_id, limit=20):
+        """
+        Returns:
+            The player's most recent results as dictionaries, newest first
+        """
+        return self._query(
+            f"SELECT {', '.join(_COLUMNS)} FROM results WHERE player_id = ? ORDER BY finished_at DESC LIMIT ?",
+            (player_id, limit),
+        )
+
+    def leaderboard(self, question_type, category=None, limit=10, including=None):
+        """
+        Top results of a mode, or of one category within it
+
+        Args:
+            including: GameResult not written yet to place in the list by
+                hand, the way `rank` counts the score it is given
+
+        Returns:
+            List of result dictionaries, best net first
+        """
+        where, params = self._scope(question_type, category)
+        results = self._query(
+            f"SELECT {', '.join(_COLUMNS)} FROM results WHERE {where} ORDER BY net DESC, finished_at LIMIT ?",
+            params + (limit,),
+        )
+        if including is not None:
+            results.append(dict(zip(_COLUMNS, including.row())))
+            results.sort(key=lambda result: (-result["net"], result["finished_at"]))
+            del results[limit:]
+        return results
+
+    def rank(self, net, question_type, category=None):
+        """
+        Where a score would place among all stored games of a mode (and category)
+
+        Returns:
+            (rank, total) where rank 1 is the best; total includes this score
+        """
+        # Summed over the per-score tallies, so the cost follows the number of
+        # distinct scores rather than the number of games
+        key = (question_type, ALL_CATEGORIES if category is None else normalize_category(category))
+        with self._lock:
+            better, total = self._conn.execute(
+                """SELECT COALESCE(SUM(CASE WHEN net > ? THEN games END), 0), COALESCE(SUM(games), 0)
+                   FROM score_counts WHERE question_type = ? AND category = ?""",
+                (net,) + key,
+            ).fetchone()
+        return better + 1, total + 1
+
+    def bankruptcies(self, player_id):
+        """Number of lost games stored for this player"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE player_id = ? AND lost = 1", (player_id,)
+            ).fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _connect(self):
+        if self.path == ":memory:":
+            # The reader and writer connections must share one in-memory database
+            conn = sqlite3.connect(f"file:game_stats_{id(self)}?mode=memory&cache=shared", uri=True,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @staticmethod
+    def _scope(question_type, category):
+        if category is None:
+            return "question_type = ?", (question_type,)
+        return "question_type = ? AND category = ?", (question_type, normalize_category(category))
+
+    def _query(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                with metrics.span("game_stats_write"), conn:
+                    conn.executemany(
+                        f"INSERT INTO results ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                        [result.row() for result in batch],
+                    )
+                    conn.executemany(
+                        """INSERT INTO score_counts (question_type, category, net, games) VALUES (?, ?, ?, 1)
+                           ON CONFLICT (question_type, category, net) DO UPDATE SET games = games + 1""",
+                        [(result.question_type, category, result.net)
+                         for result in batch for category in (ALL_CATEGORIES, result.category)],
+                    )
+                metrics.increment("game_stats_rows_written_total", len(batch))
+            except sqlite3.Error as e:
+                metrics.increment("game_stats_write_errors_total")
+                print(f"Failed to store {len(batch)} game results: {e}")
+            finally:
+                with self._pending_cond:
+                    self._pending -= len(batch)
+                    self._pending_cond.notify_all()
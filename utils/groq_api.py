@@ -3,111 +3,126 @@ Groq API integration for generating quiz questions
 """
 import random
 import os
-import requests
 import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
 from dotenv import load_dotenv
 
+from utils import metrics
+from utils.http_client import get_client
+from utils.near_duplicates import NearDuplicateIndex
+from utils.question_parser import JSONArrayStream, decode_questions, parse_questions
+from utils.scheduler import INTERACTIVE, get_scheduler
+
 load_dotenv()
 
-def generate_questions(category="general", num_questions=10, question_type="financial"):
+# GROQ_API_URL points the app at another OpenAI-compatible endpoint, e.g. utils/mock_groq.py
+GROQ_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# Category used for every "Would You Rather" game, so they all share a pool and bank
+WOULD_YOU_RATHER_CATEGORY = "fun hypothetical scenarios and would you rather questions"
+
+# Sub-themes handed to parallel shards so they don't all write the same questions
+WOULD_YOU_RATHER_THEMES = [
+    "moral dilemmas",
+    "superpowers with limitations",
+    "career and lifestyle trade-offs",
+    "time travel and reality-bending scenarios",
+    "awkward social situations",
+    "food, travel and everyday comforts",
+]
+CUSTOM_TOPIC_ANGLES = [
+    "characters and relationships",
+    "places and settings",
+    "key events and conflicts",
+    "rules, powers and objects",
+    "everyday life in that world",
+    "lesser-known details and trivia",
+]
+
+
+# Prompt pieces are built once at import; only the per-call fields are filled in
+SYSTEM_PROMPT = "You are a quiz generator. Return ONLY valid JSON, no explanations."
+
+WOULD_YOU_RATHER_INSTRUCTION = """Write adult, thought-provoking 'Would you rather' questions: moral dilemmas, \
+superpowers with limitations, career/lifestyle trade-offs, time travel, funny social situations.
+Examples:
+- Would you rather know the date of your death or the cause of your death?
+- Would you rather read minds but never turn it off, or teleport but arrive naked?"""
+
+CUSTOM_INSTRUCTION = Template("""Write immersive questions set in the world of $category ("If YOU were in this \
+scenario, what would you do?"): its choices, dilemmas and situations. NOT about money or finance. \
+Don't ask "why".
+Examples (Harry Potter):
+- You're facing a Dementor. Which memory would you use for your Patronus charm?
+- You discovered a dangerous creature in the Forbidden Forest. What's your approach?""")
+
+JSON_FORMAT = """Return ONLY a JSON array:
+[{"question": "Question text?", "options": [{"text": "Option", "money_change": 20, "multiplier": 2.0}, \
+{"text": "Option", "money_change": -15}, {"text": "Option", "money_change": -40}, \
+{"text": "Option", "money_change": -75}]}]"""
+
+COMPACT_FORMAT = """Return ONLY a JSON array, one [question, options] pair per question, each option \
+[text, money_change] or [text, money_change, multiplier]:
+[["Question text?", [["Option", 20, 2], ["Option", -15], ["Option", -40], ["Option", -75]]]]"""
+
+PROMPT = Template("""[Session ID: $seed]
+Generate exactly $count unique, original quiz questions, each on a different theme.
+$instruction$focus
+Each question has 4 options. Money rules:
+- exactly one best option: +10 to +30
+- close: -10 to -20, somewhat wrong: -30 to -50, very wrong: -60 to -90
+- about 20% of options get a multiplier of 1.5, 2, 2.5 or 3
+Use clear wording with proper spacing and punctuation.
+$format""")
+
+# Output tokens per question (with headroom) for each wire format
+TOKENS_PER_QUESTION = {"json": 160, "compact": 100}
+TOKENS_OVERHEAD = 64
+
+
+def wire_format():
+    """'compact' (positional arrays, the default) or 'json' (GROQ_WIRE_FORMAT)"""
+    return "json" if os.getenv("GROQ_WIRE_FORMAT", "compact").lower() == "json" else "compact"
+
+
+def max_tokens_for(num_questions, fmt):
+    """Output budget that fits `num_questions` without paying for a fixed 4000 tokens"""
+    return TOKENS_OVERHEAD + num_questions * TOKENS_PER_QUESTION[fmt]
+
+
+def _build_request(category, num_questions, question_type, focus=None, model=None):
     """
-    Generate quiz questions using Groq API
-    
-    Args:
-        category: Topic category for questions
-        num_questions: Number of questions to generate
+    Build the headers and chat-completions payload for a question batch
     
     Returns:
-        List of question dictionaries with options and effects
+        (headers, data, fmt) where fmt is the wire format the model was asked for
     """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY not found in environment variables")
     
-    model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    model = model or os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    fmt = wire_format()
     
     # Use random library to ensure different questions each time
     seed = random.randint(100000, 9999999)
     
-    # Build prompt based on question type
     if question_type == "would_you_rather":
-        question_instruction = f"""Generate UNIQUE and THOUGHT-PROVOKING 'Would you rather' questions.
-        
-RULES:
-- Each question MUST be COMPLETELY DIFFERENT from others
-- NO REPETITION of themes or scenarios
-- Make them engaging for ADULTS, not childish
-- Challenging moral dilemmas or interesting trade-offs
-- Creative superpowers with limitations
-- Career/lifestyle choices with consequences
-- Time travel or reality-bending scenarios
-- Social situations with humor
-
-EXAMPLES:
-- "Would you rather know the date of your death or the cause of your death?"
-- "Would you rather have the ability to read minds but never turn it off, or be able to teleport but arrive naked?"
-- "Would you rather live in a world where everyone can hear your thoughts, or you can hear everyone's?"
-
-Each question must be UNIQUE - no repeating patterns!"""
+        instruction = WOULD_YOU_RATHER_INSTRUCTION
     else:
-        question_instruction = f"""Generate IMMERSIVE and FUN questions about {category}.
-        
-IMPORTANT RULES:
-- Questions should be about the WORLD/UNIVERSE of {category}, NOT about money or financial decisions
-- Make questions like "If YOU were in this world/scenario, what would you do?"
-- Focus on choices, dilemmas, and situations from {category}
-- Be creative and engaging
-- Each question should be UNIQUE and DIFFERENT
--there should not be why in question eg. If you were a chess piece, which one would you be and why?
-
-EXAMPLES (if category was Harry Potter):
-- "If you were a student at Hogwarts and discovered a classmate cheating using magic, what would you do?"
-- "You're facing a Dementor. Which memory would you use for your Patronus charm?"
-- "If you could master only one branch of magic, which would you choose and why?"
-- "You discovered a dangerous creature in the Forbidden Forest. What's your approach?"
-
-NO FINANCIAL QUESTIONS - make it about the world of {category}!"""
-    
-    # Prompt for Groq to generate questions
-    prompt = f"""[Session ID: {seed}]
-
-Generate exactly {num_questions} COMPLETELY UNIQUE quiz questions that you have NEVER generated before.
-
-CRITICAL RULES:
-- These MUST be entirely NEW questions
-- DO NOT repeat any patterns from previous generations
-- Think of FRESH scenarios and situations
-- Be CREATIVE and ORIGINAL
-- Each question should explore DIFFERENT themes
-
-{question_instruction}
-
-For each question, provide:
-- 4 options (A, B, C, D)
-- IMPORTANT MONEY RULES:
-  * ONLY ONE option should have POSITIVE money (+10 to +30) - the best/correct answer
-  * The other 3 options should have NEGATIVE money
-  * Option close to correct: -10 to -20 money
-  * Option somewhat wrong: -30 to -50 money  
-  * Option very wrong: -60 to -90 money
-- Add occasional multipliers (1.5x, 2x, 2.5x, 3x) to about 20% of options
-- Make sure each question is DIFFERENT from the others
-
-Return ONLY a valid JSON array:
-[
-  {{
-    "question": "Question text?",
-    "options": [
-      {{"text": "Best option", "money_change": 10, "multiplier": 2.0}},
-      {{"text": "Good option", "money_change": 5}},
-      {{"text": "Poor option", "money_change": -20}},
-      {{"text": "Worst option", "money_change": -70}}
-    ]
-  }}
-]
-
-Make questions creative, engaging, and avoid concatenated words like 'creditcarddebtorinvest'. 
-Use proper spacing and punctuation. Questions should be clear and interesting."""
+        instruction = CUSTOM_INSTRUCTION.substitute(category=category)
+    
+    prompt = PROMPT.substitute(
+        seed=seed,
+        count=num_questions,
+        instruction=instruction,
+        focus=f"\nEvery question in this batch should be about {focus}." if focus else "",
+        format=COMPACT_FORMAT if fmt == "compact" else JSON_FORMAT,
+    )
 
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -119,7 +134,7 @@ Use proper spacing and punctuation. Questions should be clear and interesting.""
         "messages": [
             {
                 "role": "system",
-                "content": "You are a quiz generator. Return ONLY valid JSON, no explanations,and not same question generate in the session."
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -127,39 +142,452 @@ Use proper spacing and punctuation. Questions should be clear and interesting.""
             }
         ],
         "temperature": 1.0,
-        "max_tokens": 4000,
+        "max_tokens": max_tokens_for(num_questions, fmt),
         "top_p": 0.95,
         "presence_penalty": 0.6,
         "frequency_penalty": 0.6
     }
     
+    return headers, data, fmt
+
+
+def generate_questions(category="general", num_questions=10, question_type="financial", shards=None,
+                       priority=INTERACTIVE):
+    """
+    Generate quiz questions using Groq API
+    
+    Args:
+        category: Topic category for questions
+        num_questions: Number of questions to generate
+        shards: Split the batch into this many parallel requests
+            (defaults to the GROQ_SHARDS environment variable, or 1)
+        priority: Scheduler priority (INTERACTIVE, PREFETCH or REFILL)
+    
+    Returns:
+        List of question dictionaries with options and effects
+    """
+    if shards is None:
+        shards = int(os.getenv("GROQ_SHARDS", "1"))
+    shards = max(1, min(shards, num_questions))
+    
+    if shards == 1:
+        return _request_valid_questions(category, num_questions, question_type, priority=priority)
+    return _generate_sharded(category, num_questions, question_type, shards, priority)
+
+
+def _generate_sharded(category, num_questions, question_type, shards, priority=INTERACTIVE):
+    """
+    Run several small generations at once and merge them
+    
+    Each shard gets its own seed and sub-theme. A failed shard only costs its
+    own questions; an error is raised only if every shard fails.
+    """
+    themes = WOULD_YOU_RATHER_THEMES if question_type == "would_you_rather" else CUSTOM_TOPIC_ANGLES
+    themes = random.sample(themes, min(shards, len(themes)))
+    sizes = [num_questions // shards + (1 if i < num_questions % shards else 0) for i in range(shards)]
+    
+    with ThreadPoolExecutor(max_workers=shards) as executor:
+        futures = [
+            executor.submit(_request_valid_questions, category, size, question_type, themes[i % len(themes)], priority)
+            for i, size in enumerate(sizes)
+        ]
+    
+    questions = []
+    seen = NearDuplicateIndex(max_entries=num_questions * 2)
+    errors = []
+    for future in futures:
+        try:
+            shard_questions = future.result()
+        except Exception as e:
+            errors.append(e)
+            continue
+        for question in shard_questions:
+            if seen.admit(question["question"]):
+                questions.append(question)
+    
+    if not questions:
+        raise errors[0] if errors else ValueError("Invalid questions format")
+    if errors:
+        print(f"Groq API: {len(errors)}/{shards} shards failed, kept {len(questions)} questions")
+    
+    random.shuffle(questions)
+    return questions[:num_questions]
+
+
+def _record_usage(usage, fmt, num_questions, elapsed, model, timings=None):
+    """
+    Record token usage and the timing spans of one generation request
+
+    Args:
+        timings: Seconds per phase, such as queue (scheduler wait), connect
+            (until response headers), first_token, first_question and parse
+    """
+    metrics.increment("llm_requests_total", model=model, format=fmt)
+    metrics.observe("llm_generation_seconds", elapsed, format=fmt)
+    for phase, seconds in (timings or {}).items():
+        metrics.observe(f"llm_{phase}_seconds", seconds, model=model)
+    metrics.event("llm_request", model=model, format=fmt, questions=num_questions, total=round(elapsed, 4),
+                  usage=usage, **{phase: round(seconds, 4) for phase, seconds in (timings or {}).items()})
+    if not usage:
+        return
+    metrics.increment("llm_prompt_tokens_total", usage.get("prompt_tokens", 0), format=fmt)
+    metrics.increment("llm_completion_tokens_total", usage.get("completion_tokens", 0), format=fmt)
+    if num_questions:
+        metrics.observe("llm_completion_tokens_per_question", usage.get("completion_tokens", 0) / num_questions,
+                        format=fmt)
+
+
+def _record_error(error, model):
+    metrics.increment("llm_errors_total", model=model, error=type(error).__name__)
+    metrics.event("llm_error", model=model, error=type(error).__name__, message=str(error)[:200])
+    print(f"Error with Groq API: {error}")
+
+
+def _estimate_tokens(data):
+    """Rough token cost of a request: ~4 characters per prompt token plus the output cap"""
+    prompt_chars = sum(len(message["content"]) for message in data["messages"])
+    return prompt_chars // 4 + data["max_tokens"]
+
+
+class RequestCancelled(Exception):
+    """Raised inside a request that was cancelled, e.g. the losing side of a hedge"""
+
+
+class _Budget:
+    """
+    Scheduler admission for every attempt of one request, retries included
+
+    Passed to GroqClient.post as its attempt hooks, so each retry waits for
+    budget again and every response (a 429's Retry-After in particular)
+    reaches the scheduler before the client sleeps on it. `cancel` stops the
+    request from another thread.
+    """
+
+    def __init__(self, scheduler, priority, tokens):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tokens = tokens
+        self.charged = 0
+        self.queued = 0.0  # seconds spent waiting for the scheduler
+        self.sent_at = None  # when the first attempt left the scheduler queue
+        self.cancelled = False
+        self._response = None
+
+    def admit(self):
+        if self.cancelled:
+            raise RequestCancelled()
+        started = time.monotonic()
+        self.charged = self.scheduler.acquire(self.priority, self.tokens)
+        self.queued += time.monotonic() - started
+        if self.cancelled:
+            # Cancelled while queued, nothing was sent
+            self.scheduler.settle(self.charged, {"total_tokens": 0})
+            self.charged = 0
+            raise RequestCancelled()
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+
+    def observe(self, response):
+        self._response = response
+        if self.cancelled:
+            self._shutdown()
+        self.scheduler.observe(response)
+        if response.status_code >= 400:
+            # Rejected attempts use no tokens
+            self.scheduler.settle(self.charged, {"total_tokens": 0})
+            self.charged = 0
+
+    def settle(self, usage):
+        self.scheduler.settle(self.charged, usage)
+
+    def cancel(self):
+        """Stop the request: before it is sent, or mid-stream by shutting its socket"""
+        self.cancelled = True
+        if self._response is not None:
+            self._shutdown()
+
+    def _shutdown(self):
+        try:
+            # Wakes a read blocked in another thread, which then raises
+            self._response.raw.shutdown()
+        except (AttributeError, ValueError, RuntimeError, OSError):
+            pass
+
+
+def _request_valid_questions(category, num_questions, question_type, focus=None, priority=INTERACTIVE,
+                            attempts=3):
+    """
+    Request questions, re-requesting only the shortfall
+    
+    Questions lost to truncation, malformed JSON, schema violations or
+    near-duplicates are asked for again (up to `attempts` requests in total)
+    instead of throwing the whole batch away.
+    """
+    questions = []
+    seen = NearDuplicateIndex(max_entries=num_questions * attempts * 2)
+    for attempt in range(attempts):
+        try:
+            batch = _request_questions(category, num_questions - len(questions), question_type, focus, priority)
+        except ValueError:
+            # Nothing salvageable in this response, the next attempt may do better
+            if attempt == attempts - 1 and not questions:
+                raise
+            continue
+        for question in batch:
+            # Near-duplicates within the batch count as lost slots too
+            if seen.admit(question["question"]):
+                questions.append(question)
+        if len(questions) >= num_questions:
+            break
+    
+    if not questions:
+        raise ValueError("Invalid questions format")
+    return questions[:num_questions]
+
+
+def _request_questions(category, num_questions, question_type, focus=None, priority=INTERACTIVE):
+    """
+    Run a single non-streaming generation request
+    
+    Returns:
+        The valid questions salvaged from the response, which may be fewer
+        than requested
+    """
+    headers, data, fmt = _build_request(category, num_questions, question_type, focus)
+    budget = _Budget(get_scheduler(), priority, _estimate_tokens(data))
+    started = time.monotonic()
+    
+    timings = {}
+    
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = get_client().post(
+            GROQ_URL,
+            before_attempt=budget.admit,
+            after_attempt=budget.observe,
             headers=headers,
             json=data,
             timeout=30
         )
+        timings["queue"] = budget.queued
+        timings["connect"] = response.elapsed.total_seconds()
         response.raise_for_status()
         
         result = response.json()
-        content = result["choices"][0]["message"]["content"].strip()
+        budget.settle(result.get("usage"))
+        content = result["choices"][0]["message"]["content"]
         
-        # Remove markdown code blocks if present
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1]) if len(lines) > 2 else content
-            if content.startswith("json"):
-                content = content[4:].strip()
+        # Keeps every complete, valid question even if the output was cut off
+        parse_started = time.monotonic()
+        questions = parse_questions(content)
+        timings["parse"] = time.monotonic() - parse_started
+        _record_usage(result.get("usage"), fmt, len(questions), time.monotonic() - started, data["model"], timings)
         
-        # Parse JSON
-        questions = json.loads(content)
-        
-        if not isinstance(questions, list) or len(questions) == 0:
+        if len(questions) == 0:
             raise ValueError("Invalid questions format")
         
         return questions[:num_questions]
         
     except Exception as e:
-        print(f"Error with Groq API: {e}")
+        _record_error(e, data["model"])
+        raise
+
+
+def stream_questions(category="general", num_questions=10, question_type="financial", priority=INTERACTIVE,
+                     model=None, budget=None):
+    """
+    Generate quiz questions using the Groq streaming API
+    
+    Each question is yielded as soon as its closing brace arrives, so the first
+    question is available after roughly one question's worth of tokens.
+    
+    Args:
+        category: Topic category for questions
+        num_questions: Number of questions to generate
+        priority: Scheduler priority (INTERACTIVE, PREFETCH or REFILL)
+        model: Override GROQ_MODEL for this request
+        budget: _Budget to admit the request through, so the caller can see
+            when it is sent and cancel it
+    
+    Yields:
+        Question dictionaries with options and effects
+    """
+    headers, data, fmt = _build_request(category, num_questions, question_type, model=model)
+    data["stream"] = True
+    if budget is None:
+        budget = _Budget(get_scheduler(), priority, 0)
+    budget.tokens = _estimate_tokens(data)
+    started = time.monotonic()
+    
+    timings = {}
+    parse_seconds = 0.0
+    
+    count = 0
+    try:
+        with get_client().post(GROQ_URL, before_attempt=budget.admit, after_attempt=budget.observe,
+                               headers=headers, json=data, timeout=30, stream=True) as response:
+            timings["queue"] = budget.queued
+            timings["connect"] = response.elapsed.total_seconds()
+            response.raise_for_status()
+            # SSE responses carry no charset, don't let requests guess latin-1
+            response.encoding = "utf-8"
+            
+            parser = JSONArrayStream()
+            usage = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                
+                chunk = json.loads(payload)
+                # Groq reports usage on the last chunk, keep reading to get it
+                usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage") or usage
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if not delta or count >= num_questions:
+                    continue
+                timings.setdefault("first_token", time.monotonic() - started)
+                
+                parse_started = time.monotonic()
+                elements = parser.feed(delta)
+                questions = decode_questions(elements)
+                parse_seconds += time.monotonic() - parse_started
+                for question in questions:
+                    if count >= num_questions:
+                        break
+                    timings.setdefault("first_question", time.monotonic() - started)
+                    yield question
+                    count += 1
+            
+            budget.settle(usage)
+            timings["parse"] = parse_seconds
+            _record_usage(usage, fmt, count, time.monotonic() - started, data["model"], timings)
+        
+        if count == 0:
+            raise ValueError("Invalid questions format")
+        
+    except Exception as e:
+        if budget.cancelled:
+            if budget.sent_at is not None:
+                # No usage arrives for a cut-off stream, assume only the prompt was billed
+                budget.settle({"total_tokens": budget.tokens - data["max_tokens"]})
+            raise RequestCancelled() from e
+        _record_error(e, data["model"])
         raise
+
+
+def hedge_policy():
+    """
+    Hedging settings from the environment
+
+    Returns:
+        (fallback_model, hedge_after_seconds); fallback_model is None when
+        hedging is disabled (GROQ_FALLBACK_MODEL set empty or equal to GROQ_MODEL)
+    """
+    primary = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    fallback = os.getenv("GROQ_FALLBACK_MODEL", "llama-3.1-8b-instant")
+    hedge_after = float(os.getenv("GROQ_HEDGE_AFTER", "3.0"))
+    if not fallback or fallback == primary:
+        return None, hedge_after
+    return fallback, hedge_after
+
+
+def hedged_stream_questions(category="general", num_questions=10, question_type="financial",
+                            priority=INTERACTIVE):
+    """
+    `stream_questions` with a hedge against a slow primary model
+    
+    If the primary model has not produced a question within GROQ_HEDGE_AFTER
+    seconds of being sent (or fails before producing one), the same request
+    is sent to GROQ_FALLBACK_MODEL. Time the primary spends queued in the
+    scheduler does not count: a second request would only queue behind it.
+    Whichever model yields a valid question first wins and the rest of the
+    game is streamed from it; the loser is cancelled at once. Winners are
+    counted per model, with hedge_margin_seconds recording how long after
+    the fallback was launched the first question arrived. Only INTERACTIVE
+    requests are hedged, background work just waits.
+    
+    Yields:
+        Question dictionaries with options and effects
+    """
+    fallback, hedge_after = hedge_policy()
+    if fallback is None or priority != INTERACTIVE:
+        yield from stream_questions(category, num_questions, question_type, priority)
+        return
+    
+    primary = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    events = queue.Queue()
+    start = time.monotonic()
+    first_at = {}
+    budgets = {}
+    
+    def race(model):
+        try:
+            for question in stream_questions(category, num_questions, question_type, priority, model=model,
+                                             budget=budgets[model]):
+                first_at.setdefault(model, time.monotonic() - start)
+                events.put((model, question, None))
+        except RequestCancelled:
+            return
+        except Exception as e:
+            events.put((model, None, e))
+            return
+        events.put((model, None, None))
+    
+    launched_at = {}
+    
+    def launch(model):
+        launched_at[model] = time.monotonic() - start
+        budgets[model] = _Budget(get_scheduler(), priority, 0)
+        threading.Thread(target=race, args=(model,), daemon=True).start()
+    
+    launch(primary)
+    failures = []
+    winner = None
+    
+    while winner is None:
+        timeout = sent_at = None
+        if len(budgets) == 1:
+            sent_at = budgets[primary].sent_at
+            # Until the primary leaves the scheduler queue just check back, there is no deadline yet
+            timeout = 0.1 if sent_at is None else max(0.0, sent_at + hedge_after - time.monotonic())
+        try:
+            model, question, error = events.get(timeout=timeout)
+        except queue.Empty:
+            if sent_at is None:
+                continue
+            model, question, error = None, None, None
+        
+        if question is not None:
+            winner = model
+            break
+        if model is not None:
+            failures.append(error or ValueError("Invalid questions format"))
+            if len(failures) == 2:
+                raise failures[0]
+        if len(budgets) == 1:
+            metrics.increment("hedge_fired_total")
+            launch(fallback)
+    
+    for model, budget in budgets.items():
+        if model != winner:
+            budget.cancel()
+            metrics.increment("hedge_cancelled_total", model=model)
+    metrics.increment("hedge_wins_total", model=winner)
+    metrics.observe("time_to_first_question_seconds", first_at[winner], model=winner)
+    if len(budgets) > 1:
+        # How long after the fallback went out the race was decided: a fallback win by a
+        # small margin means the hedge barely helped, a primary win means it cost a request
+        metrics.observe("hedge_margin_seconds", first_at[winner] - launched_at[fallback], model=winner)
+    
+    yield question
+    while True:
+        model, question, error = events.get()
+        if model != winner:
+            continue
+        if question is None:
+            if error is not None:
+                raise error
+            return
+        yield question
@@ -0,0 +1,167 @@
+"""
+Pooled, retrying HTTP client shared by every session in the process
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the upstream has failed repeatedly and calls are paused"""
+
+
+class GroqClient:
+    """
+    Keep-alive `requests.Session` with retries and a circuit breaker
+
+    Transient failures (connection errors, timeouts, 429 and 5xx responses)
+    are retried with exponential backoff and full jitter, honoring any
+    `Retry-After` header. After `failure_threshold` consecutive failed calls
+    the circuit opens and calls fail fast for `reset_timeout` seconds, then a
+    single trial call is let through to probe the upstream.
+    """
+
+    def __init__(self, pool_size=32, max_retries=3, backoff=0.5, max_backoff=8.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def post(self, url, before_attempt=None, after_attempt=None, **kwargs):
+        """
+        POST with retries
+
+        Args:
+            before_attempt: Called before every attempt, retries included,
+                e.g. to wait for rate limit budget
+            after_attempt: Called with every response, including the ones
+                that are about to be retried
+
+        Returns:
+            The final response; callers still call `raise_for_status` on it
+        """
+        trial = self._before_call()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if before_attempt is not None:
+                try:
+                    before_attempt()
+                except Exception:
+                    # e.g. a cancelled request: nothing was sent, so nothing is learned about the upstream
+                    if trial:
+                        with self._lock:
+                            self._trial_running = False
+                    raise
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    self._record_failure()
+                    raise
+                metrics.increment("http_retries_total", reason=type(e).__name__)
+                self._sleep(attempt)
+                continue
+            except requests.RequestException:
+                self._record_failure()
+                raise
+
+            if after_attempt is not None:
+                after_attempt(response)
+            if response.status_code not in RETRY_STATUSES:
+                self._record_success()
+                return response
+            if last_attempt:
+                # Rate limits mean the upstream is healthy, only 5xx trips the breaker
+                if response.status_code >= 500:
+                    self._record_failure()
+                else:
+                    self._record_success()
+                return response
+
+            retry_after = _retry_after(response)
+            response.close()
+            metrics.increment("http_retries_total", reason=response.status_code)
+            self._sleep(attempt, retry_after)
+
+    def _sleep(self, attempt, retry_after=None):
+        if retry_after is not None:
+            delay = min(retry_after, self.max_backoff * 4)
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        time.sleep(delay)
+
+    def _before_call(self):
+        """
+        Returns:
+            True if this call is the trial call of a half-open circuit
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                metrics.increment("http_circuit_open_total")
+                raise CircuitOpenError("Question service is temporarily unavailable")
+            # Half-open: let one trial call through
+            self._trial_running = True
+            return True
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _retry_after(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client so connections are reused across Streamlit sessions"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GroqClient()
+        return _client
@@ -0,0 +1,252 @@
+"""
+Concurrent-session load test against the offline Groq stand-in
+
+Starts utils/mock_groq.py in-process and plays N simulated players at once.
+Each player goes through the same path as a browser session: a QuestionFeed
+backed by the shared QuestionPool, the first-batch wait from init_game, the
+prefetch top-ups between questions, and the headless engine for answers and
+skips. The real HTTP client, scheduler, coalescing and hedging all run.
+
+Usage:
+    python -m utils.load_test --players 50 --latency 0.5 --token-rate 200
+    python -m utils.load_test --players 20 --categories 1 --think 0.5 --rpm 30
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from utils import game_engine as engine
+from utils import groq_api, metrics
+from utils.mock_groq import MockConfig, MockGroqServer
+from utils.near_duplicates import NearDuplicateIndex
+from utils.question_cache import QuestionPool
+from utils.question_feed import PREFETCH_AHEAD, QUESTION_BATCH, PlayerQuestions, QuestionFeed
+from utils.question_store import get_store
+from utils.rooms import RoomRegistry
+from utils.scheduler import INTERACTIVE, PREFETCH
+
+FIRST_QUESTION_TIMEOUT = 60
+STALL_SECONDS = 0.05  # a click that waits longer than this on generation counts as a stall
+
+
+class PlayerResult:
+    __slots__ = ("time_to_first_question", "click_latencies", "stalls", "questions", "lost", "error")
+
+    def __init__(self):
+        self.time_to_first_question = None
+        self.click_latencies = []
+        self.stalls = 0
+        self.questions = 0
+        self.lost = False
+        self.error = None
+
+
+def play_game(pool, category, question_type="financial", accuracy=0.6, think=0.0, rng=None, room=None):
+    """
+    Play one game the way app_final.py drives it
+
+    Args:
+        pool: Shared QuestionPool
+        category: Category to generate questions for
+        question_type: "financial" or "would_you_rather"
+        accuracy: Chance of picking the best option
+        think: Mean seconds spent reading each question
+        rng: random.Random for choices, power-ups and think time
+        room: Play the shared questions of this Room instead of a private feed
+
+    Returns:
+        PlayerResult
+    """
+    rng = rng or random.Random()
+    result = PlayerResult()
+    player_id = uuid.uuid4().hex
+    game = engine.GameState()
+
+    started = time.perf_counter()
+    if room:
+        room.join(player_id, player_id[:6])
+        feed = room.questions
+    else:
+        feed = QuestionFeed(
+            fetch=lambda n, priority: pool.supply(category, n, question_type, player_id, priority),
+            batch_size=QUESTION_BATCH,
+            store=get_store(),
+        )
+    questions = PlayerQuestions(feed, rng)
+    questions.ensure(QUESTION_BATCH, limit=game.total_questions, priority=INTERACTIVE)
+    questions.wait_for(1, timeout=FIRST_QUESTION_TIMEOUT)
+    if len(questions) == 0:
+        result.error = repr(questions.error or ValueError("No questions generated"))
+        return result
+    result.time_to_first_question = time.perf_counter() - started
+
+    while not game.finished:
+        # Same top-up rule as top_up_questions()
+        needed = game.current_question_index + 1 + PREFETCH_AHEAD
+        priority = INTERACTIVE if game.current_question_index >= len(questions) else PREFETCH
+        questions.ensure(min(needed, game.total_questions), limit=game.total_questions, priority=priority)
+
+        clicked = time.perf_counter()
+        if not _wait_for_question(questions, game, clicked + FIRST_QUESTION_TIMEOUT):
+            result.error = repr(questions.error or TimeoutError("Ran out of questions"))
+            break
+        if time.perf_counter() - clicked > STALL_SECONDS:
+            result.stalls += 1
+
+        question = questions[game.current_question_index]
+        if not engine.skip(game):
+            best = max(range(4), key=lambda i: question['options'][i]['money_change'])
+            choice = best if rng.random() < accuracy else rng.choice([i for i in range(4) if i != best])
+            engine.apply_answer(game, question['options'][choice], rng)
+        if room:
+            room.report(player_id, game)
+        result.click_latencies.append(time.perf_counter() - clicked)
+        result.questions += 1
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+    result.lost = game.lost
+    return result
+
+
+def _wait_for_question(questions, game, deadline):
+    """
+    Block until the current question exists, like the app's spinner
+
+    A fetch that finished short (or ended just as the player got ahead of it)
+    is restarted, as the app's top-up does on its next rerun.
+    """
+    wanted = game.current_question_index + 1
+    while not questions.wait_for(wanted, timeout=max(0, deadline - time.perf_counter())):
+        if questions.error or time.perf_counter() >= deadline:
+            return False
+        questions.ensure(wanted, limit=game.total_questions, priority=INTERACTIVE)
+    return True
+
+
+def run(players=20, categories=4, question_type="financial", accuracy=0.6, think=0.0, seed=None,
+        config=None, pool_path=None, room_size=0):
+    """
+    Play `players` games concurrently against a fresh mock server
+
+    Args:
+        players: Number of simultaneous sessions
+        categories: Number of distinct categories shared among the players
+        config: MockConfig for the stand-in server
+        pool_path: SQLite file for the question pool (a temporary one by default)
+        room_size: Group players into shared rooms of this size (0 = everyone plays alone)
+
+    Returns:
+        Dict with latency percentiles, stalls, errors and upstream calls per game
+    """
+    server = MockGroqServer(config=config or MockConfig(seed=seed)).start()
+    os.environ.setdefault("GROQ_API_KEY", "mock")
+    groq_api.GROQ_URL = server.url
+    metrics.reset()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = QuestionPool(path=pool_path or os.path.join(tmp, "pool.sqlite3"), index=NearDuplicateIndex())
+        results = [None] * players
+        rooms = RoomRegistry(pool)
+        shared = {}
+        if room_size > 0:
+            for index in range(0, players, room_size):
+                shared[index // room_size] = rooms.create(f"load test topic {index % categories}", question_type)
+
+        def player(index):
+            rng = random.Random(None if seed is None else seed + index)
+            room = shared.get(index // room_size) if room_size > 0 else None
+            category = room.category if room else f"load test topic {index % categories}"
+            results[index] = play_game(pool, category, question_type, accuracy, think, rng, room)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=player, args=(i,)) for i in range(players)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        pool.close()
+    server.shutdown()
+    server.server_close()
+
+    first = [r.time_to_first_question for r in results if r.time_to_first_question is not None]
+    clicks = [latency for r in results for latency in r.click_latencies]
+    upstream = server.stats.as_dict()
+    return {
+        "players": players,
+        "elapsed": elapsed,
+        "errors": [r.error for r in results if r.error],
+        "time_to_first_question": _summary(first),
+        "click_latency": _summary(clicks),
+        "stalls_per_game": sum(r.stalls for r in results) / players,
+        "questions_per_game": sum(r.questions for r in results) / players,
+        "loss_rate": sum(r.lost for r in results) / players,
+        "upstream_calls_per_game": upstream["requests"] / players,
+        "upstream": upstream,
+    }
+
+
+def _summary(values):
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": metrics.percentile(values, 0.50),
+        "p90": metrics.percentile(values, 0.90),
+        "p99": metrics.percentile(values, 0.99),
+        "max": max(values),
+    }
+
+
+def _print_report(report):
+    print(f"== {report['players']} players in {report['elapsed']:.2f}s")
+    for name in ("time_to_first_question", "click_latency"):
+        summary = report[name]
+        if summary:
+            print(f"  {name:24} " + "  ".join(f"{k} {v * 1000:.1f}ms" for k, v in summary.items() if k != "count"))
+    for name in ("stalls_per_game", "questions_per_game", "loss_rate", "upstream_calls_per_game"):
+        print(f"  {name:24} {report[name]:.2f}")
+    print(f"  {'upstream':24} {report['upstream']}")
+    if report["errors"]:
+        print(f"  {len(report['errors'])} players failed, first: {report['errors'][0]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test Money Mayhem against an offline Groq stand-in")
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=4, help="distinct categories shared by the players")
+    parser.add_argument("--question-type", choices=["financial", "would_you_rather"], default="financial")
+    parser.add_argument("--accuracy", type=float, default=0.6)
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds spent on each question")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--room-size", type=int, default=0, help="players per shared room, 0 = no rooms")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock seconds before the first byte")
+    parser.add_argument("--token-rate", type=float, default=300.0, help="mock output tokens per second")
+    parser.add_argument("--rpm", type=int, default=0, help="mock requests per minute before 429s")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        requests_per_minute=args.rpm,
+        truncate_rate=args.truncate_rate,
+        error_rate=args.error_rate,
+        model_latency={name: float(value) for name, value in (item.split("=", 1) for item in args.model_latency)},
+        seed=args.seed,
+    )
+    report = run(args.players, max(1, args.categories), args.question_type, args.accuracy, args.think, args.seed,
+                 config, room_size=args.room_size)
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
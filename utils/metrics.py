@@ -0,0 +1,221 @@
+"""
+In-process metrics shared by every session
+
+Counters and sample windows live in memory and cost one dict update under a
+lock per call; percentiles are only computed when someone reads them. They
+can be exported as Prometheus text (`render_prometheus`, or the HTTP endpoint
+started by `serve_from_env` when METRICS_PORT is set) and selected events are
+appended to a JSON-lines log when METRICS_LOG names a file.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_SAMPLES = 2000
+QUANTILES = (0.5, 0.9, 0.99)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_totals = defaultdict(lambda: [0, 0.0])  # all-time count and sum per summary
+
+_log_lock = threading.Lock()
+_log_file = None
+_server = None
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def increment(name, value=1, **labels):
+    """Add to a counter"""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    """Record one sample of a distribution (only the latest MAX_SAMPLES are kept)"""
+    key = _key(name, labels)
+    with _lock:
+        _samples[key].append(value)
+        totals = _totals[key]
+        totals[0] += 1
+        totals[1] += value
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the enclosed block into the `<name>_seconds` summary"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+
+def event(name, **fields):
+    """
+    Append one structured event to the METRICS_LOG JSON-lines file
+
+    Does nothing unless METRICS_LOG is set. METRICS_LOG_SAMPLE (0-1, default 1)
+    keeps only that share of events to bound the log's size and cost.
+    """
+    global _log_file
+    path = os.getenv("METRICS_LOG")
+    if not path or random.random() >= float(os.getenv("METRICS_LOG_SAMPLE", "1")):
+        return
+    line = json.dumps({"ts": round(time.time(), 3), "event": name, **fields}, default=str)
+    with _log_lock:
+        if _log_file is None or _log_file.name != path:
+            if _log_file is not None:
+                _log_file.close()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _log_file = open(path, "a", encoding="utf-8", buffering=1)
+        _log_file.write(line + "\n")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _collect():
+    with _lock:
+        return (dict(_counters), {key: list(values) for key, values in _samples.items()},
+                {key: tuple(totals) for key, totals in _totals.items()})
+
+
+def snapshot():
+    """
+    Returns:
+        Dict with 'counters' and 'summaries' (count, mean, p50, p90, p99) keyed by
+        'name{label=value,...}'
+    """
+    counters, samples, _ = _collect()
+
+    def label(key):
+        name, labels = key
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+    return {
+        "counters": {label(key): value for key, value in counters.items()},
+        "summaries": {
+            label(key): {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p99": percentile(values, 0.99),
+            }
+            for key, values in samples.items() if values
+        },
+    }
+
+
+def render_prometheus():
+    """
+    Everything recorded so far in the Prometheus text exposition format
+
+    Counters become `counter`s and sample windows become `summary`s with
+    quantiles over the recent window plus all-time _count and _sum.
+    """
+    counters, samples, totals = _collect()
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        name = _metric_name(name)
+        declare(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    for key, values in sorted(samples.items()):
+        name, labels = _metric_name(key[0]), key[1]
+        declare(name, "summary")
+        for q in QUANTILES:
+            if values:
+                lines.append(f"{name}{_labels(labels + (('quantile', q),))} {_number(percentile(values, q))}")
+        count, total = totals.get(key, (len(values), sum(values)))
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+    return "\n".join(lines) + "\n"
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{_metric_name(k)}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port, host="0.0.0.0"):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json on a daemon thread
+
+    Returns:
+        The running server; calling again returns the same one
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def serve_from_env():
+    """Start the endpoint if METRICS_PORT is set, otherwise return None"""
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    return serve(int(port), os.getenv("METRICS_HOST", "0.0.0.0"))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _samples.clear()
+        _totals.clear()
@@ -0,0 +1,289 @@
+"""
+Offline stand-in for the Groq chat-completions endpoint
+
+Serves /openai/v1/chat/completions with generated quiz questions in whichever
+wire format the prompt asks for, so latency and throughput can be measured
+without a real key or network access. Latency, token rate, truncation, 5xx
+errors and per-minute rate limits (429 with Retry-After) are configurable.
+Like the real API, x-ratelimit-*-requests headers report the per-day budget.
+
+Usage:
+    python -m utils.mock_groq --port 8787 --latency 0.3 --token-rate 300
+    GROQ_API_URL=http://127.0.0.1:8787/openai/v1/chat/completions GROQ_API_KEY=mock streamlit run app_final.py
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH = "/openai/v1/chat/completions"
+CHARS_PER_TOKEN = 4
+SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sha", "vo", "gri", "pel", "dan", "zo", "fi", "qua", "bex", "nor", "ul"]
+
+
+class MockConfig:
+    """Behaviour of the mock server; every field can be changed while it runs"""
+
+    def __init__(self, latency=0.3, token_rate=300.0, requests_per_minute=0, truncate_rate=0.0,
+                 error_rate=0.0, model_latency=None, seed=None, requests_per_day=14400):
+        self.latency = latency  # seconds before the first byte
+        self.token_rate = token_rate  # output tokens per second, 0 = instant
+        self.requests_per_minute = requests_per_minute  # 0 = unlimited
+        self.requests_per_day = requests_per_day  # only reported in headers, never enforced
+        self.truncate_rate = truncate_rate  # share of responses cut off mid-array
+        self.error_rate = error_rate  # share of requests answered with a 503
+        self.model_latency = model_latency or {}  # per-model override of `latency`
+        self.rng = random.Random(seed)
+
+
+class MockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.streamed = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.truncated = 0
+        self.completion_tokens = 0
+        self.by_model = {}
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+
+class MockGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), config=None):
+        super().__init__(address, _Handler)
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self._window = deque()
+        self._day = deque()
+        self._window_lock = threading.Lock()
+        self._serial = itertools.count(1)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive or cancelled streams is routine here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        """Serve on a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def admit(self):
+        """
+        Sliding one-minute request window, plus the per-day count Groq reports
+
+        Returns:
+            (allowed, retry_after, headers) where headers are the
+            x-ratelimit-*-requests values for the daily budget
+        """
+        limit = self.config.requests_per_minute
+        daily = self.config.requests_per_day
+        now = time.monotonic()
+        with self._window_lock:
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            while self._day and now - self._day[0] >= 86400:
+                self._day.popleft()
+            allowed = not limit or len(self._window) < limit
+            retry_after = 60 - (now - self._window[0]) if not allowed else None
+            if allowed:
+                self._window.append(now)
+                self._day.append(now)
+            used = len(self._day)
+        headers = {
+            "x-ratelimit-limit-requests": str(daily),
+            "x-ratelimit-remaining-requests": str(max(0, daily - used)),
+            # Time until the daily budget has refilled completely
+            "x-ratelimit-reset-requests": f"{used * 86400 / daily:.2f}s",
+        }
+        return allowed, retry_after, headers
+
+    def make_questions(self, count, topic):
+        """Distinct, schema-valid questions"""
+        rng = self.config.rng
+        questions = []
+        for _ in range(count):
+            serial = next(self._serial)
+            options = [
+                {"text": f"Best choice {serial}", "money_change": rng.randint(10, 30)},
+                {"text": f"Close choice {serial}", "money_change": -rng.randint(10, 20)},
+                {"text": f"Wrong choice {serial}", "money_change": -rng.randint(30, 50)},
+                {"text": f"Terrible choice {serial}", "money_change": -rng.randint(60, 90)},
+            ]
+            for option in options:
+                if rng.random() < 0.2:
+                    option["multiplier"] = rng.choice([1.5, 2.0, 2.5, 3.0])
+            # Random made-up words so questions don't look like near-duplicates of each other
+            words = " ".join("".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(6))
+            questions.append({"question": f"Mock question {serial} about {topic}: {words}?", "options": options})
+        return questions
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockGroqServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, self.server.stats.as_dict())
+
+    def do_POST(self):
+        if self.path != PATH:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        model = body.get("model", "mock")
+        self.server.stats.add(requests=1)
+
+        allowed, retry_after, limit_headers = self.server.admit()
+        if not allowed:
+            self.server.stats.add(rate_limited=1)
+            self._send_json(429, {"error": {"message": "Rate limit reached"}},
+                            {**limit_headers, "Retry-After": str(max(1, int(retry_after + 0.999)))})
+            return
+        if config.rng.random() < config.error_rate:
+            self.server.stats.add(errors=1)
+            self._send_json(503, {"error": {"message": "Service unavailable"}}, limit_headers)
+            return
+
+        prompt = "".join(message.get("content", "") for message in body.get("messages", []))
+        match = re.search(r"Generate exactly (\d+)", prompt)
+        count = int(match.group(1)) if match else 10
+        topic = re.search(r"world of (.+?) \(", prompt)
+        questions = self.server.make_questions(count, topic.group(1) if topic else "would you rather")
+        if "[question, options]" in prompt:
+            payload = [[q["question"], [[o["text"], o["money_change"]] + ([o["multiplier"]] if "multiplier" in o else [])
+                                        for o in q["options"]]] for q in questions]
+        else:
+            payload = questions
+        content = json.dumps(payload)
+
+        # Cut off like a response that hit max_tokens
+        max_chars = body.get("max_tokens", 4000) * CHARS_PER_TOKEN
+        truncated = len(content) > max_chars or config.rng.random() < config.truncate_rate
+        if truncated:
+            content = content[:min(max_chars, int(len(content) * config.rng.uniform(0.4, 0.9)))]
+            self.server.stats.add(truncated=1)
+
+        completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        usage = {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "completion_tokens": completion_tokens,
+            "total_tokens": len(prompt) // CHARS_PER_TOKEN + completion_tokens,
+        }
+        with self.server.stats._lock:
+            self.server.stats.completion_tokens += completion_tokens
+            self.server.stats.by_model[model] = self.server.stats.by_model.get(model, 0) + 1
+
+        time.sleep(config.model_latency.get(model, config.latency))
+        finish_reason = "length" if truncated else "stop"
+        if body.get("stream"):
+            self.server.stats.add(streamed=1)
+            self._stream(content, usage, finish_reason, limit_headers)
+        else:
+            if config.token_rate:
+                time.sleep(completion_tokens / config.token_rate)
+            self._send_json(200, {
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            }, limit_headers)
+
+    def _stream(self, content, usage, finish_reason, headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        config = self.server.config
+        chunk_chars = CHARS_PER_TOKEN * 4
+        try:
+            for start in range(0, len(content), chunk_chars):
+                piece = content[start:start + chunk_chars]
+                if config.token_rate:
+                    time.sleep(len(piece) / CHARS_PER_TOKEN / config.token_rate)
+                self._write_event({"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            self._write_event({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                               "x_groq": {"usage": usage}})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            # The client cancelled (e.g. a hedged request that lost)
+            pass
+
+    def _write_event(self, event):
+        self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an offline Groq stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte")
+    parser.add_argument("--token-rate", type=float, default=300.0, help="output tokens per second")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        requests_per_minute=args.rpm,
+        truncate_rate=args.truncate_rate,
+        error_rate=args.error_rate,
+        model_latency={name: float(value) for name, value in (item.split("=", 1) for item in args.model_latency)},
+    )
+    server = MockGroqServer((args.host, args.port), config)
+    print(f"Mock Groq listening on {server.url} (stats at /stats)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Near-duplicate detection for generated questions
+
+Questions are reduced to MinHash signatures over character shingles of their
+normalized text and bucketed with locality-sensitive hashing, so a lookup
+only compares against the few stored questions that share a band. Entries are
+grouped by scope (a pool, a player, a single batch). Each scope keeps at most
+`max_per_scope` entries, and only once the whole index holds `max_entries`
+is the oldest entry of any scope dropped, which bounds memory.
+"""
+import os
+import re
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+
+DEFAULT_PATH = os.getenv("NEAR_DUP_INDEX_PATH", os.path.join(".cache", "near_duplicates.npz"))
+# Sizing of the process-wide index; each entry costs roughly 1.5 KB with its LSH buckets
+DEFAULT_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "50000"))
+DEFAULT_MAX_PER_SCOPE = int(os.getenv("NEAR_DUP_MAX_PER_SCOPE", "500"))
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity almost always share a band
+SHINGLE = 5
+THRESHOLD = 0.6  # estimated Jaccard similarity at which two questions count as the same
+
+# Fixed seed so signatures stay comparable across restarts
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text):
+    """Lowercase and keep only letters, digits and single spaces"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM uint32 values) of the text's character shingles"""
+    text = normalize(text)
+    if len(text) <= SHINGLE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # Multiply-shift hashing, one row per permutation; uint64 overflow wraps on purpose
+    with np.errstate(over="ignore"):
+        permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of question texts, grouped by scope
+
+    Signatures live in a fixed table of `max_entries` rows. A scope that
+    reaches `max_per_scope` entries drops its own oldest one, so a busy pool or
+    player never pushes out the others; when the table is full the oldest
+    entry overall is dropped. Thread-safe. With a `path` the index is loaded
+    at start-up and written back by `save` (also every `save_every`
+    additions).
+    """
+
+    def __init__(self, max_entries=10000, threshold=THRESHOLD, path=None, save_every=200, max_per_scope=None):
+        self.max_entries = max_entries
+        self.max_per_scope = max_per_scope or max_entries
+        self.threshold = threshold
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one writer of `path` at a time
+        self._signatures = np.zeros((max_entries, NUM_PERM), dtype=np.uint32)
+        self._scopes = [None] * max_entries
+        self._buckets = {}  # band hash -> slot, or list of slots when several share it
+        self._free = list(range(max_entries - 1, -1, -1))  # unused slots, next one last
+        self._age = OrderedDict()  # used slots, oldest first
+        self._by_scope = {}  # scope -> deque of its slots, oldest first
+        self._unsaved = 0
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._age)
+
+    def similarity(self, text, scope=""):
+        """Highest estimated similarity of `text` to anything stored in `scope` (0 if none)"""
+        sig = signature(text)
+        with self._lock:
+            return self._best(sig, scope)
+
+    def admit(self, text, scope=""):
+        """
+        Store `text` unless it nearly duplicates something already in `scope`
+
+        Returns:
+            True if the text was new and has been added
+        """
+        sig = signature(text)
+        with self._lock:
+            if self._best(sig, scope) >= self.threshold:
+                return False
+            self._add(sig, scope)
+        self._maybe_save()
+        return True
+
+    def add(self, text, scope=""):
+        sig = signature(text)
+        with self._lock:
+            self._add(sig, scope)
+        self._maybe_save()
+
+    def remove(self, text, scope=""):
+        """
+        Forget the entries of `scope` with exactly this text's signature
+
+        Returns:
+            Number of entries removed
+        """
+        sig = signature(text)
+        with self._lock:
+            slots = [slot for slot in self._candidates(sig, scope) if (self._signatures[slot] == sig).all()]
+            for slot in slots:
+                self._unlink(slot)
+            self._unsaved += len(slots)
+        return len(slots)
+
+    def save(self):
+        """Write the index to `path` atomically, oldest entry first"""
+        if not self.path:
+            return
+        with self._save_lock:
+            self._write()
+
+    def _write(self):
+        with self._lock:
+            order = list(self._age)
+            scopes = np.array([self._scopes[slot] for slot in order], dtype=str)
+            signatures = self._signatures[order]
+            self._unsaved = 0
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A temp file of its own, so a save from another process can't interleave with this one
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, scopes=scopes, signatures=signatures)
+            os.replace(temp, self.path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def _candidates(self, sig, scope):
+        candidates = set()
+        for key in self._band_keys(sig, scope):
+            found = self._buckets.get(key)
+            if isinstance(found, list):
+                candidates.update(found)
+            elif found is not None:
+                candidates.add(found)
+        # Band hashes can collide across scopes, the scope check settles it
+        return [slot for slot in candidates if self._scopes[slot] == scope]
+
+    def _best(self, sig, scope):
+        candidates = self._candidates(sig, scope)
+        if not candidates:
+            return 0.0
+        return float((self._signatures[candidates] == sig).mean(axis=1).max())
+
+    def _add(self, sig, scope):
+        slots = self._by_scope.get(scope)
+        if slots is not None and len(slots) >= self.max_per_scope:
+            self._unlink(slots[0])
+        if not self._free:
+            self._unlink(next(iter(self._age)))
+        slot = self._free.pop()
+        self._signatures[slot] = sig
+        self._scopes[slot] = scope
+        self._age[slot] = None
+        self._by_scope.setdefault(scope, deque()).append(slot)
+        for key in self._band_keys(sig, scope):
+            found = self._buckets.get(key)
+            if found is None:
+                self._buckets[key] = slot
+            elif isinstance(found, list):
+                found.append(slot)
+            else:
+                self._buckets[key] = [found, slot]
+        self._unsaved += 1
+
+    def _unlink(self, slot):
+        scope = self._scopes[slot]
+        for key in self._band_keys(self._signatures[slot], scope):
+            found = self._buckets.get(key)
+            if isinstance(found, list):
+                if slot in found:
+                    found.remove(slot)
+                if len(found) == 1:
+                    self._buckets[key] = found[0]
+            elif found == slot:
+                del self._buckets[key]
+        slots = self._by_scope[scope]
+        if slots[0] == slot:
+            slots.popleft()
+        else:
+            slots.remove(slot)
+        if not slots:
+            del self._by_scope[scope]
+        del self._age[slot]
+        self._scopes[slot] = None
+        self._free.append(slot)
+
+    @staticmethod
+    def _band_keys(sig, scope):
+        rows = NUM_PERM // BANDS
+        data = sig.tobytes()
+        width = rows * sig.itemsize
+        return [hash((scope, band, data[band * width:(band + 1) * width])) for band in range(BANDS)]
+
+    def _maybe_save(self):
+        # If another thread is already saving, its snapshot covers these additions or the next save will
+        if not self.path or not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                due = self._unsaved >= self.save_every
+            if due:
+                self._write()
+        finally:
+            self._save_lock.release()
+
+    def _load(self):
+        try:
+            with np.load(self.path) as data:
+                scopes, signatures = data["scopes"], data["signatures"]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            # Truncated or corrupt (e.g. zipfile.BadZipFile): it is only a cache, start empty
+            print(f"Ignoring unreadable near-duplicate index {self.path}: {e}")
+            return
+        if signatures.ndim != 2 or signatures.shape[1] != NUM_PERM:
+            return
+        for scope, sig in zip(scopes[-self.max_entries:], signatures[-self.max_entries:]):
+            self._add(sig.astype(np.uint32), str(scope))
+        self._unsaved = 0
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Process-wide persistent index (NEAR_DUP_INDEX_PATH), shared by every session
+
+    Sized by NEAR_DUP_MAX_ENTRIES and NEAR_DUP_MAX_PER_SCOPE.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(DEFAULT_MAX_ENTRIES, path=DEFAULT_PATH, max_per_scope=DEFAULT_MAX_PER_SCOPE)
+        return _index
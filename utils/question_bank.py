@@ -0,0 +1,294 @@
+"""
+Pre-generated question banks for popular topics
+
+Each (question_type, category) bank is two append-only files: `.jsonl` with
+one question per line and `.idx` with a fixed-width (offset, length) record
+per question. Games pick random records through memory maps of both files,
+so startup and per-game memory stay flat however large a bank grows, and
+nothing is parsed except the questions actually served.
+
+Build a bank offline (uses the normal generation path and rate limits):
+    python -m utils.question_bank build --type custom --category "harry potter" --count 2000
+    python -m utils.question_bank build --type would_you_rather --count 5000
+    python -m utils.question_bank stats
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.groq_api import WOULD_YOU_RATHER_CATEGORY, generate_questions
+from utils.near_duplicates import NearDuplicateIndex
+from utils.question_cache import normalize_category, pool_key
+from utils.question_parser import validate_question
+from utils.scheduler import REFILL
+
+DEFAULT_DIR = os.getenv("QUESTION_BANK_DIR", os.path.join(".cache", "question_bank"))
+
+RECORD = struct.Struct("<QI")  # byte offset and length of one question in the .jsonl file
+
+
+class _Mapped:
+    """Read-only memory maps of one bank, remapped when the files grow"""
+
+    def __init__(self, base):
+        self.base = base
+        self.count = 0
+        self._files = None
+        self._index = None
+        self._data = None
+
+    def refresh(self):
+        """Pick up records appended since the last call; returns the record count"""
+        try:
+            index_size = os.path.getsize(self.base + ".idx")
+        except OSError:
+            return 0
+        count = index_size // RECORD.size
+        if count != self.count:
+            self.close()
+            if count:
+                index_file = open(self.base + ".idx", "rb")
+                data_file = open(self.base + ".jsonl", "rb")
+                self._files = (index_file, data_file)
+                self._index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.count = count
+        return self.count
+
+    def read(self, position):
+        offset, length = RECORD.unpack_from(self._index, position * RECORD.size)
+        return json.loads(self._data[offset:offset + length])
+
+    def close(self):
+        for resource in (self._index, self._data, *(self._files or ())):
+            if resource is not None:
+                resource.close()
+        self._files = self._index = self._data = None
+        self.count = 0
+
+
+class QuestionBank:
+    """
+    Directory of pre-generated question banks
+
+    Safe to share between sessions; `sample` only touches the pages of the
+    records it returns. A missing or empty bank simply has no questions.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mapped = {}
+
+    def path(self, question_type, category):
+        """File path of a bank without extension"""
+        key = pool_key(question_type, category)
+        slug = re.sub(r"[^a-z0-9]+", "-", normalize_category(category)).strip("-")[:40] or "bank"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.directory, f"{question_type}--{slug}-{digest}")
+
+    def count(self, question_type, category):
+        with self._lock:
+            return self._get(question_type, category).refresh()
+
+    def sample(self, question_type, category, count, exclude=(), rng=random):
+        """
+        Pick up to `count` distinct random questions
+
+        Args:
+            exclude: Record positions that must not be returned (already served)
+
+        Returns:
+            List of (position, question dictionary) pairs
+        """
+        with self._lock:
+            mapped = self._get(question_type, category)
+            total = mapped.refresh()
+            exclude = set(exclude)
+            available = total - len(exclude)
+            if available <= 0:
+                return []
+            if available <= count * 4:
+                # Nearly exhausted: pick from what is left directly
+                positions = rng.sample([p for p in range(total) if p not in exclude], min(count, available))
+            else:
+                positions = []
+                taken = set(exclude)
+                while len(positions) < count:
+                    position = rng.randrange(total)
+                    if position not in taken:
+                        taken.add(position)
+                        positions.append(position)
+            return [(position, mapped.read(position)) for position in positions]
+
+    def append(self, question_type, category, questions):
+        """
+        Append questions to a bank
+
+        The data is written before its index records, so a reader never sees a
+        record whose question is not fully on disk.
+
+        Returns:
+            Number of questions written
+        """
+        base = self.path(question_type, category)
+        os.makedirs(self.directory, exist_ok=True)
+        lines = [json.dumps(question, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                 for question in questions]
+        if not lines:
+            return 0
+        with self._lock:
+            with open(base + ".jsonl", "ab") as data_file:
+                offset = data_file.seek(0, os.SEEK_END)
+                records = []
+                for line in lines:
+                    data_file.write(line + b"\n")
+                    records.append(RECORD.pack(offset, len(line)))
+                    offset += len(line) + 1
+                data_file.flush()
+                os.fsync(data_file.fileno())
+            with open(base + ".idx", "ab") as index_file:
+                index_file.write(b"".join(records))
+            if not os.path.exists(base + ".meta.json"):
+                with open(base + ".meta.json", "w", encoding="utf-8") as meta_file:
+                    json.dump({"question_type": question_type, "category": category,
+                               "pool_key": pool_key(question_type, category)}, meta_file)
+        return len(lines)
+
+    def questions(self, question_type, category):
+        """Every stored question in order (reads the whole bank, meant for offline tools)"""
+        try:
+            with open(self.path(question_type, category) + ".jsonl", "rb") as data_file:
+                for line in data_file:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def banks(self):
+        """
+        Returns:
+            List of (question_type, category, count) for every bank in the directory
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".meta.json"):
+                continue
+            with open(os.path.join(self.directory, name), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            found.append((meta["question_type"], meta["category"],
+                          self.count(meta["question_type"], meta["category"])))
+        return found
+
+    def close(self):
+        with self._lock:
+            for mapped in self._mapped.values():
+                mapped.close()
+            self._mapped.clear()
+
+    def _get(self, question_type, category):
+        base = self.path(question_type, category)
+        if base not in self._mapped:
+            self._mapped[base] = _Mapped(base)
+        return self._mapped[base]
+
+
+def build(bank, question_type, category, target, batch_size=20, workers=4, max_failures=5, log=print,
+          shards=None):
+    """
+    Generate, validate and de-duplicate questions until a bank holds `target`
+
+    Near-duplicates of questions already in the bank or the same run are dropped.
+    With `shards` (default GROQ_SHARDS, or 1) each batch is split into that
+    many parallel requests on different sub-themes, which keeps large banks
+    from filling up with repeats of the same few ideas.
+
+    Batches run `workers` at a time at REFILL priority, so a live game sharing
+    the process and its rate limits always goes first.
+
+    Returns:
+        Number of questions added
+    """
+    seen = NearDuplicateIndex(max_entries=max(target, 1) + batch_size * workers * 4)
+    have = 0
+    for question in bank.questions(question_type, category):
+        seen.add(question["question"])
+        have += 1
+    added = 0
+    failures = 0
+    stale = 0
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        while True:
+            while len(running) < workers and have + added + len(running) * batch_size < target:
+                running.add(executor.submit(generate_questions, category, batch_size, question_type,
+                                            shards=shards, priority=REFILL))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    batch = future.result()
+                except Exception as e:
+                    failures += 1
+                    log(f"batch failed ({failures}/{max_failures}): {e}")
+                    continue
+                fresh = []
+                for question in batch:
+                    question = validate_question(question)
+                    if question is not None and seen.admit(question["question"]):
+                        fresh.append(question)
+                fresh = fresh[:max(0, target - have - added)]
+                added += bank.append(question_type, category, fresh)
+                # A topic that keeps producing repeats is exhausted
+                stale = stale + 1 if len(fresh) < len(batch) // 4 else 0
+                log(f"{have + added}/{target} questions ({time.monotonic() - started:.0f}s)")
+            if failures >= max_failures or stale >= 3 * workers:
+                for future in running:
+                    future.cancel()
+                log("stopping early: " + ("too many failures" if failures >= max_failures else "mostly duplicates"))
+                break
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and inspect pre-generated question banks")
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="generate questions into a bank")
+    build_parser.add_argument("--type", choices=["custom", "would_you_rather"], default="custom")
+    build_parser.add_argument("--category", help="topic (not needed for would_you_rather)")
+    build_parser.add_argument("--count", type=int, default=1000, help="questions the bank should hold")
+    build_parser.add_argument("--batch", type=int, default=20, help="questions per request")
+    build_parser.add_argument("--workers", type=int, default=4, help="batches in flight")
+    build_parser.add_argument("--shards", type=int, default=None,
+                              help="parallel sub-theme requests per batch (default GROQ_SHARDS or 1)")
+    commands.add_parser("stats", help="list banks and their sizes")
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank(args.dir)
+    if args.command == "stats":
+        for question_type, category, count in bank.banks():
+            print(f"{count:8,}  {question_type}: {category}")
+        return
+
+    category = WOULD_YOU_RATHER_CATEGORY if args.type == "would_you_rather" else args.category
+    if not category:
+        parser.error("--category is required for custom banks")
+    added = build(bank, args.type, category, args.count, args.batch, args.workers, shards=args.shards)
+    print(f"Added {added} questions, bank now holds {bank.count(args.type, category)}")
+
+
+if __name__ == "__main__":
+    main()
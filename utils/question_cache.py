@@ -0,0 +1,325 @@
+"""
+Persistent question pool shared across game sessions
+"""
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+from utils.groq_api import hedged_stream_questions
+from utils.near_duplicates import get_index
+from utils.scheduler import INTERACTIVE
+from utils.single_flight import StreamFlight
+
+DEFAULT_PATH = os.getenv("QUESTION_CACHE_PATH", os.path.join(".cache", "question_pool.sqlite3"))
+
+SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    pool_key TEXT PRIMARY KEY,
+    question_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pool_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_pool ON questions (pool_key, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_fingerprint ON questions (pool_key, fingerprint);
+CREATE TABLE IF NOT EXISTS served (
+    player_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (player_id, question_id)
+);
+CREATE INDEX IF NOT EXISTS idx_served_question ON served (question_id);
+CREATE TABLE IF NOT EXISTS bank_served (
+    player_id TEXT NOT NULL,
+    pool_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (player_id, pool_key, position)
+);
+"""
+
+
+def normalize_category(category):
+    """Lowercase and collapse whitespace so 'Harry  Potter' and 'harry potter' share a pool"""
+    return " ".join(str(category).lower().split())
+
+
+def pool_key(question_type, category):
+    return f"{question_type}:{normalize_category(category)}"
+
+
+def fingerprint(question):
+    """Hash of the normalized question text, used to store each question once"""
+    text = " ".join(str(question.get("question", "")).lower().split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _record_lookup(question_type, hits, misses):
+    """Count questions served from the pool vs. ones that had to be generated"""
+    metrics.increment("question_pool_hits_total", hits, question_type=question_type)
+    if misses > 0:
+        metrics.increment("question_pool_misses_total", misses, question_type=question_type)
+
+
+# Each streamed request asks for this much more than its first caller needs, for callers that join it
+_stream_flight = StreamFlight(surplus=float(os.getenv("QUESTION_STREAM_SURPLUS", "1.0")))
+
+
+def stream_coalesced(category, num_questions, question_type, priority=INTERACTIVE, leftover=None):
+    """
+    `hedged_stream_questions` with concurrent identical requests sharing one stream
+
+    A caller that arrives while a request for the same pool is still
+    streaming joins it and receives its own questions from the surplus, so
+    the saving follows the number of requests in flight.
+
+    Args:
+        leftover: Called with the surplus questions nobody joined for
+    """
+    # Priority is part of the key so a game start never queues behind a refill
+    key = (pool_key(question_type, category), priority)
+    return _stream_flight.subscribe(
+        key, num_questions, lambda count: hedged_stream_questions(category, count, question_type, priority=priority),
+        on_leftover=leftover,
+    )
+
+
+class QuestionPool:
+    """
+    SQLite-backed pool of generated questions keyed by (question_type, category)
+
+    Questions are drawn without replacement per player, so the same player never
+    sees a question twice while other players can still be served it. Old
+    questions expire after `ttl` seconds and the least recently used pools are
+    dropped once the store holds more than `max_questions`.
+
+    An optional pre-built QuestionBank is drawn from before the pool, with the
+    positions served to each player recorded here.
+
+    A NearDuplicateIndex keeps near-duplicates of stored questions out of each
+    pool and of each player's games (the process-wide one by default).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_questions=5000, max_per_pool=500,
+                 ttl=7 * 24 * 3600, streamer=stream_coalesced, bank=None, index=None):
+        self.path = path
+        self.max_questions = max_questions
+        self.max_per_pool = max_per_pool
+        self.ttl = ttl
+        self.streamer = streamer
+        self.bank = bank
+        self.index = index if index is not None else get_index()
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # It's only a cache, start over rather than migrate
+            self._conn.executescript("DROP TABLE IF EXISTS questions; DROP TABLE IF EXISTS served; "
+                                     "DROP TABLE IF EXISTS pools; DROP TABLE IF EXISTS bank_served;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def draw(self, question_type, category, player_id, count):
+        """
+        Take up to `count` random questions this player has not seen
+
+        Returns:
+            List of freshly decoded question dictionaries (safe to mutate)
+        """
+        key = pool_key(question_type, category)
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                """SELECT q.id, q.body FROM questions q
+                   WHERE q.pool_key = ? AND q.created_at >= ?
+                   AND NOT EXISTS (SELECT 1 FROM served s
+                                   WHERE s.player_id = ? AND s.question_id = q.id)
+                   ORDER BY RANDOM() LIMIT ?""",
+                (key, now - self.ttl, player_id, count),
+            ).fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO served (player_id, question_id) VALUES (?, ?)",
+                [(player_id, row[0]) for row in rows],
+            )
+            self._touch(key, question_type, category, now)
+        return [json.loads(row[1]) for row in rows]
+
+    def add(self, question_type, category, questions, served_to=None):
+        """
+        Store newly generated questions and apply eviction
+
+        Args:
+            served_to: Player id that already received these questions, if any
+        """
+        key = pool_key(question_type, category)
+        now = time.time()
+        with self._lock, self._conn:
+            for question in questions:
+                # The model can regenerate a stored question word for word, store it once
+                digest = fingerprint(question)
+                exists = self._conn.execute(
+                    "SELECT 1 FROM questions WHERE pool_key = ? AND fingerprint = ?", (key, digest)
+                ).fetchone()
+                if not exists and not self.index.admit(question["question"], key):
+                    metrics.increment("near_duplicates_rejected_total", stage="pool", question_type=question_type)
+                    continue
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO questions (pool_key, fingerprint, body, created_at) VALUES (?, ?, ?, ?)",
+                    (key, digest, json.dumps(question), now),
+                )
+                if served_to is not None:
+                    self._conn.execute(
+                        """INSERT OR IGNORE INTO served (player_id, question_id)
+                           SELECT ?, id FROM questions WHERE pool_key = ? AND fingerprint = ?""",
+                        (served_to, key, digest),
+                    )
+            self._touch(key, question_type, category, now)
+            self._evict(now, keep=key)
+
+    def stream_questions(self, category, num_questions, question_type, player_id, priority=INTERACTIVE):
+        """
+        Stream fresh questions to one player while refilling the pool
+
+        Questions are yielded as they arrive and the batch is stored, already
+        marked as served to this player, once the stream ends. Surplus
+        questions the stream produced for nobody go into the pool unserved.
+
+        Yields:
+            Question dictionaries (copies, safe to mutate)
+        """
+        batch = []
+        try:
+            leftover = lambda questions: self.add(question_type, category, questions)
+            for question in self.streamer(category, num_questions, question_type, priority, leftover):
+                batch.append(question)
+                yield copy.deepcopy(question)
+        finally:
+            if batch:
+                self.add(question_type, category, batch, served_to=player_id)
+
+    def supply(self, category, num_questions, question_type, player_id, priority=INTERACTIVE, attempts=3):
+        """
+        Yield `num_questions` for one player: banked, then pooled, then streamed
+
+        Only the shortfall the bank and pool cannot cover is streamed from the
+        LLM. Questions that nearly repeat one this player was already served
+        are dropped and their slots refilled from the next source; the stream
+        is retried up to `attempts` times.
+        """
+        wanted = num_questions
+        for question in self._unseen(self.draw_banked(question_type, category, player_id, wanted),
+                                     player_id, question_type):
+            yield question
+            wanted -= 1
+        if wanted > 0:
+            pooled = self.draw(question_type, category, player_id, wanted)
+            _record_lookup(question_type, len(pooled), wanted - len(pooled))
+            for question in self._unseen(pooled, player_id, question_type):
+                yield question
+                wanted -= 1
+        for _ in range(attempts):
+            if wanted <= 0:
+                break
+            streamed = self.stream_questions(category, wanted, question_type, player_id, priority)
+            for question in self._unseen(streamed, player_id, question_type):
+                yield question
+                wanted -= 1
+
+    def _unseen(self, questions, player_id, question_type):
+        """Drop questions that nearly repeat one already served to this player"""
+        scope = f"player:{player_id}"
+        for question in questions:
+            if self.index.admit(question["question"], scope):
+                yield question
+            else:
+                metrics.increment("near_duplicates_rejected_total", stage="player", question_type=question_type)
+
+    def draw_banked(self, question_type, category, player_id, count):
+        """
+        Take up to `count` questions this player has not seen from the question bank
+
+        Returns:
+            List of question dictionaries (empty without a bank for this topic)
+        """
+        if self.bank is None or count <= 0:
+            return []
+        key = pool_key(question_type, category)
+        with self._lock:
+            served = [row[0] for row in self._conn.execute(
+                "SELECT position FROM bank_served WHERE player_id = ? AND pool_key = ?", (player_id, key))]
+        picked = self.bank.sample(question_type, category, count, exclude=served)
+        if picked:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO bank_served (player_id, pool_key, position) VALUES (?, ?, ?)",
+                    [(player_id, key, position) for position, _ in picked],
+                )
+            metrics.increment("question_bank_hits_total", len(picked), question_type=question_type)
+        return [question for _, question in picked]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _touch(self, key, question_type, category, now):
+        self._conn.execute(
+            """INSERT INTO pools (pool_key, question_type, category, last_used) VALUES (?, ?, ?, ?)
+               ON CONFLICT (pool_key) DO UPDATE SET last_used = excluded.last_used""",
+            (key, question_type, normalize_category(category), now),
+        )
+
+    def _evict(self, now, keep=None):
+        # TTL: expired questions go first
+        self._delete_questions("created_at < ?", (now - self.ttl,))
+
+        # Per-pool cap: keep only the newest questions of each pool
+        self._delete_questions(
+            """id IN (SELECT id FROM (
+                   SELECT id, ROW_NUMBER() OVER (PARTITION BY pool_key ORDER BY created_at DESC, id DESC) AS rn
+                   FROM questions) WHERE rn > ?)""",
+            (self.max_per_pool,),
+        )
+
+        # Global cap: drop whole pools in least recently used order
+        total = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        if total > self.max_questions:
+            lru = self._conn.execute(
+                """SELECT p.pool_key, COUNT(q.id) FROM pools p
+                   JOIN questions q ON q.pool_key = p.pool_key
+                   WHERE p.pool_key != ? GROUP BY p.pool_key ORDER BY p.last_used""",
+                (keep or "",),
+            ).fetchall()
+            for key, size in lru:
+                if total <= self.max_questions:
+                    break
+                self._delete_questions("pool_key = ?", (key,))
+                total -= size
+
+        self._conn.execute(
+            "DELETE FROM pools WHERE pool_key NOT IN (SELECT DISTINCT pool_key FROM questions)"
+        )
+
+    def _delete_questions(self, where, params):
+        # Their near-duplicate entries go too, or they would keep blocking questions that repeat nothing stored
+        for key, body in self._conn.execute(f"SELECT pool_key, body FROM questions WHERE {where}", params):
+            self.index.remove(json.loads(body)["question"], key)
+        self._conn.execute(
+            f"DELETE FROM served WHERE question_id IN (SELECT id FROM questions WHERE {where})", params
+        )
+        self._conn.execute(f"DELETE FROM questions WHERE {where}", params)
@@ -0,0 +1,155 @@
+"""
+Question list that keeps filling in the background while a game is played
+"""
+import itertools
+import random
+import threading
+from array import array
+
+QUESTION_BATCH = 5  # questions fetched per top-up
+PREFETCH_AHEAD = 3  # start a top-up when fewer than this many questions are queued
+
+OPTION_ORDERS = tuple(itertools.permutations(range(4)))  # every question has 4 options: 24 orders
+
+
+class QuestionFeed:
+    """
+    List-like holder for a game's questions
+
+    Questions already available are served immediately, the rest are appended
+    by a background thread as a generator (such as `stream_questions`) yields
+    them. Readers use `wait_for` to block only when they get ahead of it.
+
+    With a `fetch(n, **fetch_args)` callable the feed tops itself up on demand: `ensure`
+    starts a background fetch of at least `batch_size` questions whenever the
+    supply gets close to what the game needs.
+
+    With a QuestionStore the feed keeps references to the shared, read-only
+    questions interned there instead of its own copies; holding them also
+    keeps them stored for as long as the feed is in use.
+    """
+
+    def __init__(self, questions=None, prepare=None, fetch=None, batch_size=QUESTION_BATCH, store=None):
+        self._prepare = prepare
+        self._fetch = fetch
+        self.batch_size = batch_size
+        self.store = store
+        self._questions = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self.error = None
+        for question in questions or []:
+            self._append(question)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __getitem__(self, index):
+        return self._questions[index]
+
+    def __iter__(self):
+        return iter([self[index] for index in range(len(self._questions))])
+
+    @property
+    def done(self):
+        """True when no background generation is running"""
+        # Read once: the worker clears _thread as it finishes, without the caller holding the lock
+        thread = self._thread
+        return thread is None or not thread.is_alive()
+
+    def ensure(self, count, limit=None, **fetch_args):
+        """
+        Fetch more questions in the background if fewer than `count` exist
+
+        Args:
+            count: Number of questions that should be available soon
+            limit: Never fetch beyond this many questions in total
+            fetch_args: Extra keyword arguments passed on to `fetch`
+        """
+        # Under the lock so sessions sharing a feed (rooms) never start two fetches
+        with self._cond:
+            if self._fetch is None or len(self._questions) >= count or not self.done:
+                return
+            wanted = max(count - len(self._questions), self.batch_size)
+            if limit is not None:
+                wanted = min(wanted, limit - len(self._questions))
+            if wanted > 0:
+                self.start(self._fetch(wanted, **fetch_args))
+
+    def start(self, source):
+        """Consume `source` on a background thread, appending each question"""
+        self.error = None
+        thread = threading.Thread(target=self._run, args=(source,), daemon=True)
+        self._thread = thread
+        thread.start()
+
+    def wait_for(self, count, timeout=None):
+        """
+        Block until at least `count` questions exist or generation has stopped
+
+        Returns:
+            True if `count` questions are available
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._questions) >= count or self.done, timeout)
+            return len(self._questions) >= count
+
+    def _run(self, source):
+        try:
+            for question in source:
+                with self._cond:
+                    self._append(question)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                # Wake readers even though is_alive() only flips after we return
+                self._thread = None
+                self._cond.notify_all()
+
+    def _append(self, question):
+        if self._prepare:
+            question = self._prepare(question)
+        self._questions.append(question if self.store is None else self.store.add(question))
+
+
+class PlayerQuestions:
+    """
+    One player's view of a (possibly shared) store-backed QuestionFeed
+
+    Options are shown in a per-player random order, kept as one byte per
+    question (an index into OPTION_ORDERS) instead of reordering the shared
+    questions. Everything else is delegated to the feed.
+    """
+
+    __slots__ = ("feed", "orders", "rng")
+
+    def __init__(self, feed, rng=random):
+        self.feed = feed
+        self.orders = array("B")
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.feed)
+
+    def __getitem__(self, index):
+        question = self.feed[index]
+        # Orders are drawn on first read so they cost nothing for unplayed questions
+        while len(self.orders) <= index:
+            self.orders.append(self.rng.randrange(len(OPTION_ORDERS)))
+        return question.reordered(OPTION_ORDERS[self.orders[index]])
+
+    @property
+    def done(self):
+        return self.feed.done
+
+    @property
+    def error(self):
+        return self.feed.error
+
+    def ensure(self, count, limit=None, **fetch_args):
+        self.feed.ensure(count, limit, **fetch_args)
+
+    def wait_for(self, count, timeout=None):
+        return self.feed.wait_for(count, timeout)
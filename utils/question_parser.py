@@ -0,0 +1,175 @@
+"""
+Incremental parsing of the JSON question array returned by the LLM
+"""
+import json
+import math
+
+
+class JSONArrayStream:
+    """
+    Incrementally parse a JSON array, returning each top-level element once complete
+
+    Text before the opening '[' (such as a ```json fence) and after the closing
+    ']' is ignored, so partial model output can be fed in as it arrives.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._closed = False
+        self._element = []
+
+    @property
+    def closed(self):
+        """True once the outer array has been closed"""
+        return self._closed
+
+    def feed(self, text):
+        """
+        Consume the next chunk of text
+
+        Returns:
+            List of elements completed by this chunk
+        """
+        completed = []
+        for char in text:
+            if self._closed:
+                break
+            if self._depth >= 2:
+                self._element.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self._depth >= 2:
+                    self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._element = [char]
+            elif char in "]}":
+                if self._depth == 0:
+                    continue
+                self._depth -= 1
+                if self._depth == 1:
+                    element = self._decode("".join(self._element))
+                    if element is not None:
+                        completed.append(element)
+                    self._element = []
+                elif self._depth == 0:
+                    self._closed = True
+        return completed
+
+    @staticmethod
+    def _decode(text):
+        try:
+            return json.loads(text)
+        except ValueError:
+            # One malformed element should not cost the rest of the array
+            return None
+
+
+def validate_question(question):
+    """
+    Check a question against the game's schema
+
+    A question needs non-empty `question` text and exactly 4 options, each with
+    `text`, an integer `money_change` and optionally a positive numeric
+    `multiplier`.
+
+    Returns:
+        A cleaned copy of the question, or None if it doesn't fit the schema
+    """
+    if not isinstance(question, dict):
+        return None
+    text = question.get("question")
+    options = question.get("options")
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+
+    cleaned = []
+    for option in options:
+        if not isinstance(option, dict) or not isinstance(option.get("text"), str) or not option["text"].strip():
+            return None
+        money = option.get("money_change")
+        if isinstance(money, bool) or not isinstance(money, (int, float)):
+            return None
+        if isinstance(money, float) and not money.is_integer():
+            return None
+        entry = {"text": option["text"].strip(), "money_change": int(money)}
+        if option.get("multiplier") is not None:
+            multiplier = option["multiplier"]
+            if isinstance(multiplier, bool) or not isinstance(multiplier, (int, float)) \
+                    or not math.isfinite(multiplier) or multiplier <= 0:
+                return None
+            entry["multiplier"] = float(multiplier)
+        cleaned.append(entry)
+    return {"question": text.strip(), "options": cleaned}
+
+
+def decode_question(element):
+    """
+    Turn one parsed array element into a validated question dictionary
+
+    Accepts the verbose object shape and the compact positional shape
+    `["Question?", [["Option", money_change], ["Option", money_change, multiplier], ...]]`.
+
+    Returns:
+        A validated question dictionary, or None
+    """
+    if isinstance(element, list):
+        if len(element) != 2 or not isinstance(element[0], str) or not isinstance(element[1], list):
+            return None
+        options = []
+        for option in element[1]:
+            if not isinstance(option, list) or len(option) not in (2, 3):
+                return None
+            entry = {"text": option[0], "money_change": option[1]}
+            if len(option) == 3 and option[2] != 1:
+                entry["multiplier"] = option[2]
+            options.append(entry)
+        element = {"question": element[0], "options": options}
+    return validate_question(element)
+
+
+def decode_questions(elements):
+    """
+    Turn the elements completed by a JSONArrayStream into validated questions
+
+    Some models wrap the array, e.g. {"questions": [...]}; the whole inner array
+    then arrives as one element and its questions are unpacked from it.
+
+    Returns:
+        List of validated question dictionaries (possibly empty)
+    """
+    questions = []
+    for element in elements:
+        wrapped = isinstance(element, list) and element and not isinstance(element[0], str)
+        for candidate in element if wrapped else [element]:
+            question = decode_question(candidate)
+            if question is not None:
+                questions.append(question)
+    return questions
+
+
+def parse_questions(content):
+    """
+    Salvage every valid question from model output
+
+    Works on truncated output (cut off at max_tokens), stray text or code
+    fences around the array, wrapped arrays and arrays with some malformed
+    objects: complete questions are kept, anything else is dropped. Both the
+    verbose and the compact wire shapes are understood.
+
+    Returns:
+        List of validated question dictionaries (possibly empty)
+    """
+    return decode_questions(JSONArrayStream().feed(content))
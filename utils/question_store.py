@@ -0,0 +1,144 @@
+"""
+Shared, immutable storage for question content
+
+Every session used to hold its own decoded copy of each question. Questions
+are now interned once per process as read-only objects and sessions keep only
+references to them (see QuestionFeed), so the same question played by many
+sessions (pooled, banked or shared in a room) costs its text once.
+"""
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class Option:
+    """Read-only answer option; supports option['text'] and option.get('multiplier')"""
+
+    __slots__ = ("text", "money_change", "multiplier")
+
+    def __init__(self, text, money_change, multiplier=1.0):
+        object.__setattr__(self, "text", sys.intern(text))
+        object.__setattr__(self, "money_change", money_change)
+        object.__setattr__(self, "multiplier", multiplier)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("stored options are read-only")
+
+    def _key(self):
+        return self.text, self.money_change, self.multiplier
+
+    def __eq__(self, other):
+        return isinstance(other, Option) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class Question:
+    """Read-only question; supports question['question'] and question['options']"""
+
+    __slots__ = ("question", "options", "__weakref__")
+
+    def __init__(self, question, options):
+        object.__setattr__(self, "question", sys.intern(question))
+        object.__setattr__(self, "options", tuple(options))
+
+    @classmethod
+    def from_dict(cls, question):
+        """Build from a validated question dictionary"""
+        return cls(question["question"], [
+            Option(option["text"], option["money_change"], option.get("multiplier", 1.0))
+            for option in question["options"]
+        ])
+
+    def reordered(self, order):
+        """The same question with its options in `order` (a tuple of option indexes)"""
+        return Question(self.question, [self.options[i] for i in order])
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("stored questions are read-only")
+
+    def key(self):
+        """The question's content, identical for equal questions"""
+        return self.question, self.options
+
+    def __eq__(self, other):
+        return isinstance(other, Question) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+class QuestionStore:
+    """
+    Process-wide intern table for question content
+
+    Adding a question with the same content as a stored one returns the
+    stored Question, so every session holding it shares one object. Entries
+    are held weakly: a question stays stored for as long as any feed refers to
+    it, so content is never dropped from under a running game or an idle
+    room. The `max_questions` most recently added questions are also kept
+    alive, so content that is drawn again soon after is still shared.
+    Thread-safe.
+    """
+
+    def __init__(self, max_questions=50000):
+        self.max_questions = max_questions
+        self._lock = threading.Lock()
+        self._live = weakref.WeakValueDictionary()  # content -> Question while anything refers to it
+        self._recent = OrderedDict()  # content -> Question, least recently added first
+
+    def __len__(self):
+        return len(self._live)
+
+    def add(self, question):
+        """
+        Intern a question dictionary (or Question)
+
+        Returns:
+            The stored Question with this content
+        """
+        if not isinstance(question, Question):
+            question = Question.from_dict(question)
+        key = question.key()
+        with self._lock:
+            stored = self._live.get(key)
+            if stored is None:
+                stored = self._live[key] = question
+            self._recent[key] = stored
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_questions:
+                self._recent.popitem(last=False)
+            return stored
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store shared by every session"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QuestionStore()
+        return _store
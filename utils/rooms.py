@@ -0,0 +1,136 @@
+"""
+Shared rooms: one question set played by many sessions
+
+A host creates a room for a category and everyone who joins plays the same
+questions, generated once and shared through a single QuestionFeed, with their
+own option order, money, loan and power-up state. Scores are reported to the room and read
+back as a live scoreboard. Everything lives in process memory, so it works
+for sessions served by the same Streamlit server.
+"""
+import random
+import threading
+import time
+
+from utils.question_feed import QUESTION_BATCH, QuestionFeed
+from utils.question_store import get_store
+from utils.scheduler import INTERACTIVE
+
+ROOM_ID_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no 0/O or 1/I mix-ups
+ROOM_ID_LENGTH = 5
+
+
+class Room:
+    """One shared question set and the scores of everyone playing it"""
+
+    def __init__(self, room_id, category, question_type, questions, host_name=""):
+        self.room_id = room_id
+        self.category = category
+        self.question_type = question_type
+        self.questions = questions
+        self.host_name = host_name
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self._lock = threading.Lock()
+        self._scores = {}
+
+    def join(self, player_id, name):
+        """Add a player to the scoreboard (joining twice keeps the existing entry)"""
+        with self._lock:
+            self.last_active = time.time()
+            if player_id not in self._scores:
+                self._scores[player_id] = {
+                    "name": name or f"Player {len(self._scores) + 1}",
+                    "net": 0, "answered": 0, "total": 0, "finished": False, "lost": False,
+                }
+
+    def report(self, player_id, game):
+        """Update a player's entry from their GameState"""
+        with self._lock:
+            entry = self._scores.get(player_id)
+            if entry is None:
+                return
+            self.last_active = time.time()
+            entry.update(
+                net=game.net,
+                answered=game.current_question_index,
+                total=game.total_questions,
+                finished=game.finished,
+                lost=game.finished and game.lost,
+            )
+
+    def scoreboard(self):
+        """
+        Returns:
+            List of score entries, best net money first
+        """
+        with self._lock:
+            entries = [dict(entry, player_id=player_id) for player_id, entry in self._scores.items()]
+        return sorted(entries, key=lambda entry: (entry["lost"], -entry["net"], -entry["answered"]))
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class RoomRegistry:
+    """
+    Rooms of one server process, looked up by their short id
+
+    Rooms idle for longer than `ttl` seconds are dropped when new ones are
+    created, and at most `max_rooms` are kept.
+    """
+
+    def __init__(self, pool, ttl=6 * 3600, max_rooms=500, store=None):
+        self.pool = pool
+        self.store = store if store is not None else get_store()
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self._lock = threading.Lock()
+        self._rooms = {}
+
+    def create(self, category, question_type, host_name="", prepare=None):
+        """
+        Open a room and start generating its questions
+
+        Args:
+            prepare: Applied once to each question as it arrives (e.g. option shuffling)
+
+        Returns:
+            The new Room
+        """
+        with self._lock:
+            self._expire()
+            room_id = self._new_id()
+            # The room is one "player" of the pool, so its questions are drawn once for everyone
+            source = f"room:{room_id}"
+            questions = QuestionFeed(
+                prepare=prepare,
+                fetch=lambda n, priority: self.pool.supply(category, n, question_type, source, priority),
+                batch_size=QUESTION_BATCH,
+                store=self.store,
+            )
+            room = Room(room_id, category, question_type, questions, host_name)
+            self._rooms[room_id] = room
+        questions.ensure(QUESTION_BATCH, priority=INTERACTIVE)
+        return room
+
+    def get(self, room_id):
+        """The room with this id (case-insensitive), or None"""
+        with self._lock:
+            return self._rooms.get(str(room_id).strip().upper())
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _new_id(self):
+        while True:
+            room_id = "".join(random.choices(ROOM_ID_ALPHABET, k=ROOM_ID_LENGTH))
+            if room_id not in self._rooms:
+                return room_id
+
+    def _expire(self):
+        now = time.time()
+        for room_id in [r for r, room in self._rooms.items() if now - room.last_active > self.ttl]:
+            del self._rooms[room_id]
+        while len(self._rooms) >= self.max_rooms:
+            oldest = min(self._rooms.values(), key=lambda room: room.last_active)
+            del self._rooms[oldest.room_id]
@@ -0,0 +1,179 @@
+"""
+Process-wide rate limit scheduler for all LLM traffic
+
+Every Streamlit session shares one Groq API key, so requests and tokens are
+budgeted here before anything is sent. Interactive game starts are served
+ahead of background prefetch and pool refills, and low priority work is
+never allowed to spend the last slice of the budget.
+"""
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+
+# Priorities, lower is served first
+INTERACTIVE = 0
+PREFETCH = 1
+REFILL = 2
+
+
+class _Bucket:
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available at the current refill rate"""
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else 1.0
+
+    def sync(self, limit, remaining, reset):
+        """Adopt the upstream's view of this budget"""
+        if limit is not None and limit > 0:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+        # Refill rate that brings the budget back to full at the reset time,
+        # relearned on every response so it can fall as well as rise
+        self.rate = self.capacity / self.period
+        if reset and self.capacity > self.level:
+            self.rate = max(self.rate, (self.capacity - self.level) / reset)
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket admission for requests and tokens, with priorities
+
+    `acquire` blocks until both budgets allow the call. Waiters are served in
+    priority order (FIFO within a priority). Jobs below INTERACTIVE priority
+    also have to leave `reserve` of each budget untouched.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=12000, reserve=0.25):
+        self.reserve = reserve
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def acquire(self, priority=INTERACTIVE, tokens=0, timeout=None):
+        """
+        Block until the call may be sent
+
+        Args:
+            priority: INTERACTIVE, PREFETCH or REFILL
+            tokens: Estimated tokens the call will use
+
+        Returns:
+            The tokens charged, to pass back to `settle`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    reserve = self.reserve if priority > INTERACTIVE else 0.0
+                    charge = min(tokens, self._tokens.capacity * (1 - reserve))
+                    wait = max(
+                        self._paused_until - now,
+                        self._requests.wait_time(1 + reserve * self._requests.capacity),
+                        self._tokens.wait_time(charge + reserve * self._tokens.capacity),
+                    )
+                    if self._waiting[0] == entry and wait <= 0:
+                        self._requests.level -= 1
+                        self._tokens.level -= charge
+                        return charge
+                    if deadline is not None and now >= deadline:
+                        raise TimeoutError("Timed out waiting for the LLM rate limit")
+                    wait = min(wait if wait > 0 else 0.05, 1.0)
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def settle(self, charged, usage):
+        """Correct the token budget once the response `usage` is known"""
+        if not usage:
+            return
+        actual = usage.get("total_tokens")
+        if actual is None:
+            return
+        with self._cond:
+            self._tokens.level += charged - actual
+            self._cond.notify_all()
+
+    def observe(self, response):
+        """
+        Learn the token budget from Groq's x-ratelimit-* headers, and pause on 429s
+
+        Groq's *-tokens headers describe the per-minute token budget, but its
+        *-requests headers describe requests per day, so the request bucket
+        stays at GROQ_RPM and only a 429 slows it further.
+        """
+        headers = response.headers
+        with self._cond:
+            self._tokens.sync(
+                _number(headers.get("x-ratelimit-limit-tokens")),
+                _number(headers.get("x-ratelimit-remaining-tokens")),
+                _duration(headers.get("x-ratelimit-reset-tokens")),
+            )
+            if response.status_code == 429:
+                retry_after = _number(headers.get("retry-after")) or 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._cond.notify_all()
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def _duration(value):
+    """Parse Groq reset durations such as '7.66s', '2m59.56s' or '120ms'"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return _number(value)
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler sized from GROQ_RPM and GROQ_TPM; token headers can override GROQ_TPM"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler(
+                requests_per_minute=float(os.getenv("GROQ_RPM", "30")),
+                tokens_per_minute=float(os.getenv("GROQ_TPM", "12000")),
+            )
+        return _scheduler
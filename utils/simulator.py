@@ -0,0 +1,243 @@
+"""
+Vectorized Monte Carlo simulator for the game economy
+
+Plays many games at once with NumPy arrays (one lane per game), following
+the same rules as utils/game_engine.py. Question payouts are sampled from the
+money rules given to the LLM in utils/groq_api.py, and answers come from a
+configurable player policy.
+
+Usage:
+    python -m utils.simulator --games 1000000
+    python -m utils.simulator --policy random --set shield_chance=0.1
+    python -m utils.simulator --sweep boost_chance=0.05,0.09,0.2 --sweep accuracy=0.4,0.6
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils import game_engine as engine
+
+DEFAULT_RULES = {
+    "start_money": engine.START_MONEY,
+    "questions": engine.QUESTIONS_PER_GAME,
+    "loan_interest": engine.LOAN_INTEREST,
+    "min_questions_for_loan": engine.MIN_QUESTIONS_FOR_LOAN,
+    "boost_chance": engine.BOOST_CHANCE,
+    "boost_multiplier": engine.BOOST_MULTIPLIER,
+    "skip_chance": engine.SKIP_CHANCE,
+    "shield_chance": engine.SHIELD_CHANCE,
+    "curse_chance": engine.CURSE_CHANCE,
+    "curse_extra": engine.CURSE_EXTRA_QUESTIONS,
+    # Money rules from the generation prompt: best, close, somewhat wrong, very wrong
+    "payout_ranges": ((10, 30), (-20, -10), (-50, -30), (-90, -60)),
+    "multiplier_chance": 0.2,
+    "multipliers": (1.5, 2.0, 2.5, 3.0),
+}
+
+DEFAULT_POLICY = {
+    # "skilled" picks the best option with probability `accuracy`, otherwise a
+    # random other one; "random" ignores accuracy and picks uniformly
+    "policy": "skilled",
+    "accuracy": 0.6,
+    "skip_prob": 1.0,  # chance of using a held skip token on a question
+    "loan_amount": 100,  # borrowed when allowed and net money is negative, 0 = never
+    "repay": True,  # pay the loan back in full as soon as cash covers it
+}
+
+
+def simulate(games, rules=None, policy=None, seed=None):
+    """
+    Play `games` games at once
+
+    Args:
+        games: Number of games (lanes)
+        rules: Overrides for DEFAULT_RULES
+        policy: Overrides for DEFAULT_POLICY
+        seed: Seed for reproducible runs
+
+    Returns:
+        Dict of summary statistics
+    """
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    policy = {**DEFAULT_POLICY, **(policy or {})}
+    rng = np.random.default_rng(seed)
+
+    money = np.full(games, rules["start_money"], dtype=np.int64)
+    loan = np.zeros(games, dtype=np.int64)
+    loan_taken = np.zeros(games, dtype=bool)
+    loans = np.zeros(games, dtype=np.int32)
+    index = np.zeros(games, dtype=np.int32)
+    total = np.full(games, rules["questions"], dtype=np.int32)
+    answered = np.zeros(games, dtype=np.int32)
+    boost = np.ones(games, dtype=np.float64)
+    skips = np.zeros(games, dtype=np.int32)
+    shields = np.zeros(games, dtype=np.int32)
+    curses = np.zeros(games, dtype=np.int32)
+    saves = np.zeros(games, dtype=np.int32)
+    over = np.zeros(games, dtype=bool)
+
+    low = np.array([r[0] for r in rules["payout_ranges"]])
+    high = np.array([r[1] for r in rules["payout_ranges"]])
+    multipliers = np.array(rules["multipliers"], dtype=np.float64)
+    curse_extra = np.array(rules["curse_extra"], dtype=np.int32)
+
+    while True:
+        active = ~over & (index < total)
+        lanes = np.flatnonzero(active)
+        if lanes.size == 0:
+            break
+        n = lanes.size
+
+        # Loan: borrow when net money is negative and enough questions remain
+        if policy["loan_amount"] > 0:
+            borrow = (~loan_taken[lanes] & (money[lanes] - loan[lanes] < 0)
+                      & (total[lanes] - index[lanes] >= rules["min_questions_for_loan"]))
+            b = lanes[borrow]
+            money[b] += policy["loan_amount"]
+            loan[b] = policy["loan_amount"]
+            loan_taken[b] = True
+            loans[b] += 1
+
+        # Skip: no payout, no interest, no power-up rolls
+        use_skip = (skips[lanes] > 0) & (rng.random(n) < policy["skip_prob"])
+        s = lanes[use_skip]
+        skips[s] -= 1
+        index[s] += 1
+        lanes = lanes[~use_skip]
+        n = lanes.size
+        if n == 0:
+            continue
+
+        # Choose an option and sample its payout
+        if policy["policy"] == "random":
+            choice = rng.integers(0, 4, n)
+        else:
+            wrong = rng.integers(1, 4, n)
+            choice = np.where(rng.random(n) < policy["accuracy"], 0, wrong)
+        base = rng.integers(low[choice], high[choice] + 1)
+        option_mult = np.where(rng.random(n) < rules["multiplier_chance"],
+                               multipliers[rng.integers(0, len(multipliers), n)], 1.0)
+        actual = np.trunc(base * (option_mult * boost[lanes])).astype(np.int64)
+        money[lanes] += actual
+        answered[lanes] += 1
+
+        # Loan interest on every answered question
+        owing = lanes[loan_taken[lanes]]
+        loan[owing] += (loan[owing] * rules["loan_interest"]).astype(np.int64)
+
+        # Power-up rolls
+        boost[lanes] = np.where(rng.random(n) < rules["boost_chance"], rules["boost_multiplier"], 1.0)
+        skips[lanes] += rng.random(n) < rules["skip_chance"]
+        gain_shield = (rng.random(n) < rules["shield_chance"]) & (shields[lanes] == 0)
+        shields[lanes[gain_shield]] = 1
+        cursed = lanes[rng.random(n) < rules["curse_chance"]]
+        curses[cursed] += 1
+        total[cursed] += curse_extra[rng.integers(0, len(curse_extra), cursed.size)]
+
+        # Shield and bankruptcy
+        net = money[lanes] - loan[lanes]
+        shielded = (net < 0) & (shields[lanes] > 0)
+        sh = lanes[shielded]
+        shields[sh] -= 1
+        saves[sh] += 1
+        money[sh] -= net[shielded]
+        net = money[lanes] - loan[lanes]
+        left = total[lanes] - (index[lanes] + 1)
+        over[lanes[(net < 0) & (left == 0)]] = True
+        index[lanes] += 1
+
+        # Repay in full once cash covers the debt
+        if policy["repay"]:
+            payers = lanes[loan_taken[lanes] & (money[lanes] >= loan[lanes]) & ~over[lanes]]
+            money[payers] -= loan[payers]
+            loan[payers] = 0
+            loan_taken[payers] = False
+
+    final_net = money - loan
+    lost = over | (final_net < 0)
+    borrowed = loans > 0
+    lengths, counts = np.unique(total, return_counts=True)
+    return {
+        "games": games,
+        "win_rate": float(np.mean(~lost)),
+        "bankruptcy_rate": float(np.mean(over)),
+        "mean_final_net": float(np.mean(final_net)),
+        "final_net_p10_p50_p90": [float(v) for v in np.percentile(final_net, [10, 50, 90])],
+        "mean_questions_answered": float(np.mean(answered)),
+        "game_length": {int(length): float(count / games) for length, count in zip(lengths, counts)},
+        "loan_rate": float(np.mean(borrowed)),
+        "win_rate_with_loan": float(np.mean(~lost[borrowed])) if borrowed.any() else None,
+        "unpaid_loan_rate": float(np.mean(loan > 0)),
+        "mean_unpaid_loan": float(np.mean(loan[loan > 0])) if (loan > 0).any() else 0.0,
+        "shield_saves_per_game": float(np.mean(saves)),
+        "curse_rate": float(np.mean(curses > 0)),
+    }
+
+
+def _parse_value(text):
+    if "/" in text:
+        return tuple(_parse_value(part) for part in text.split("/"))
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return {"true": True, "false": False}.get(text.lower(), text)
+
+
+def _split_overrides(assignments):
+    """'key=value' pairs into rule and policy overrides"""
+    rules, policy = {}, {}
+    for assignment in assignments:
+        key, value = assignment.split("=", 1)
+        target = policy if key in DEFAULT_POLICY else rules
+        if key not in DEFAULT_POLICY and key not in DEFAULT_RULES:
+            raise SystemExit(f"Unknown parameter: {key}")
+        target[key] = _parse_value(value)
+    return rules, policy
+
+
+def _print_summary(label, stats, elapsed):
+    print(f"== {label} ({stats['games']:,} games in {elapsed:.2f}s)")
+    for key, value in stats.items():
+        if key != "games" and value is not None:
+            if isinstance(value, dict):
+                value = ", ".join(f"{k}: {v:.2%}" for k, v in value.items())
+            elif isinstance(value, float):
+                value = f"{value:.4f}"
+            print(f"  {key:26} {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Money Mayhem games")
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--policy", choices=["skilled", "random"], default=None)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a rule or policy parameter (tuples as 2/3)")
+    parser.add_argument("--sweep", action="append", default=[], metavar="KEY=V1,V2,...",
+                        help="run every combination of these values")
+    args = parser.parse_args(argv)
+
+    rules, policy = _split_overrides(args.set)
+    if args.policy:
+        policy["policy"] = args.policy
+
+    grid = [{}]
+    for sweep in args.sweep:
+        key, values = sweep.split("=", 1)
+        grid = [{**combo, key: value} for combo in grid for value in values.split(",")]
+
+    for combo in grid:
+        combo_rules, combo_policy = _split_overrides(f"{k}={v}" for k, v in combo.items())
+        started = time.perf_counter()
+        stats = simulate(args.games, {**rules, **combo_rules}, {**policy, **combo_policy}, args.seed)
+        label = ", ".join(f"{k}={v}" for k, v in combo.items()) or "baseline"
+        _print_summary(label, stats, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Coalescing of identical in-flight generation requests
+"""
+import math
+import threading
+
+from utils import metrics
+
+
+class SharedStream:
+    """
+    Deal one generator's items out to several subscribers
+
+    The source is started at once for the first subscriber's limit plus a
+    `surplus` share on top. Callers that arrive while it is still running can
+    join and claim part of that surplus: they take the spare items already
+    buffered straight away, then are dealt new ones. Items are dealt
+    round-robin so no two subscribers get the same item. The source runs on
+    its own thread so a subscriber that stops early does not cut the stream
+    short for the others; its unread share goes back to the surplus. Items
+    nobody claimed are handed to `on_leftover` once the source ends.
+    """
+
+    def __init__(self, factory, limit, surplus=1.0, on_close=None, on_leftover=None):
+        self._on_close = on_close
+        self._on_leftover = on_leftover
+        self._cond = threading.Condition()
+        self._closed = False
+        self._finished = False
+        self._error = None
+        self._shares = [[]]  # items dealt to each subscriber, the first is the caller starting the stream
+        self._wanted = [limit]  # items each subscriber still needs
+        self._spare = []  # items received while nobody needed one
+        self._next = 0  # subscriber the next item is offered to first
+        self.limit = limit
+        self.demand = limit  # items asked for by every caller that found this stream running
+        self.requested = max(limit, math.ceil(limit * (1 + surplus)))
+        self._unclaimed = self.requested - limit
+        threading.Thread(target=self._run, args=(factory,), daemon=True).start()
+
+    @property
+    def subscribers(self):
+        return len(self._shares)
+
+    def join(self, limit):
+        """
+        Claim up to `limit` items of the surplus
+
+        Returns:
+            (index, claimed) for the new subscriber, or None once the stream
+            has ended or its whole surplus is claimed
+        """
+        with self._cond:
+            if self._closed:
+                return None
+            self.demand += limit
+            if self._unclaimed <= 0:
+                return None
+            claimed = min(limit, self._unclaimed)
+            self._unclaimed -= claimed
+            share = self._spare[:claimed]
+            del self._spare[:claimed]
+            self._shares.append(share)
+            self._wanted.append(claimed - len(share))
+            return len(self._shares) - 1, claimed
+
+    def subscribe(self, index):
+        """Yield the items dealt to subscriber `index` as they arrive"""
+        taken = 0
+        try:
+            while True:
+                with self._cond:
+                    share = self._shares[index]
+                    self._cond.wait_for(lambda: len(share) > taken or self._wanted[index] == 0 or self._finished)
+                    if len(share) == taken:
+                        if self._error is not None and self._wanted[index] > 0:
+                            raise self._error
+                        return
+                    item = share[taken]
+                taken += 1
+                yield item
+        finally:
+            with self._cond:
+                # Whatever this subscriber will not read can be claimed by a later one
+                self._unclaimed += self._wanted[index] + len(self._shares[index]) - taken
+                self._spare.extend(self._shares[index][taken:])
+                self._wanted[index] = 0
+
+    def _deal(self, item):
+        count = len(self._shares)
+        for step in range(count):
+            index = (self._next + step) % count
+            if self._wanted[index] > 0:
+                self._shares[index].append(item)
+                self._wanted[index] -= 1
+                self._next = index + 1
+                return
+        self._spare.append(item)
+
+    def _run(self, factory):
+        try:
+            for item in factory(self.requested):
+                with self._cond:
+                    self._deal(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._closed = self._finished = True
+                leftover, self._spare = self._spare, []
+                self._cond.notify_all()
+            if self._on_close:
+                self._on_close()
+            if leftover and self._on_leftover:
+                try:
+                    self._on_leftover(leftover)
+                except Exception as e:
+                    print(f"Dropped {len(leftover)} unclaimed stream items: {e}")
+
+
+class StreamFlight:
+    """
+    Coalesce concurrent identical requests for a stream into one upstream call
+
+    Each upstream request asks for more items than its first caller needs,
+    and callers for the same key join it while it runs until that surplus is
+    claimed. The surplus is at least `surplus` times the first caller's
+    limit and follows the demand seen by the key's previous request, or by
+    the running one whose surplus ran out (up to `max_factor` times the
+    limit), so it grows with the number of callers in flight. `stream_flight_subscribers` records how many callers
+    each request served.
+    """
+
+    def __init__(self, surplus=1.0, max_factor=8.0):
+        self.surplus = surplus
+        self.max_factor = max_factor
+        self._lock = threading.Lock()
+        self._streams = {}
+        self._demand = {}  # key -> smoothed demand per request, as a multiple of the first caller's limit
+
+    def subscribe(self, key, limit, factory, on_leftover=None):
+        """
+        Join the running stream for `key`, or start one with `factory(count)`
+
+        A caller joining late may be given fewer than `limit` items when
+        little surplus is left; it asks again for the rest.
+
+        Args:
+            on_leftover: Called with the items no subscriber claimed, if any,
+                when a stream this call started ends
+
+        Yields:
+            Up to `limit` items, none of which another subscriber receives
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            joined = stream.join(limit) if stream is not None else None
+            if joined is None:
+                # A running stream whose surplus ran out shows how many callers are in flight right now
+                demand = max(self._demand.get(key, 1.0), stream.demand / max(stream.limit, 1) if stream else 1.0)
+                surplus = max(self.surplus, min(self.max_factor, demand) - 1)
+                stream = self._streams[key] = SharedStream(
+                    factory, limit, surplus, on_close=lambda: self._close(key, stream), on_leftover=on_leftover
+                )
+                index = 0
+            else:
+                index = joined[0]
+                metrics.increment("stream_flight_joins_total")
+        return stream.subscribe(index)
+
+    def _close(self, key, stream):
+        factor = min(self.max_factor, stream.demand / max(stream.limit, 1))
+        with self._lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+            self._demand[key] = (self._demand.get(key, factor) + factor) / 2
+        metrics.observe("stream_flight_subscribers", stream.subscribers)